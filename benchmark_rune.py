@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Rune Detection Benchmark
+Measure RuneDetector throughput, latency and memory across backends, image sizes,
+batch sizes and thread counts, and compare against a stored baseline
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+
+from detect_rune import BACKENDS, RuneDetector, collect_image_paths, file_hash
+from rune_process import run_json_process
+
+# Metrics compared against the baseline and whether higher values are better
+COMPARED_METRICS = {
+    'throughput_fps': True,
+    'p50_ms': False,
+    'p99_ms': False,
+    'peak_rss_mb': False,
+    'startup_ms': False
+}
+
+# Entry point invocations whose cold start is tracked with --startup
+STARTUP_COMMANDS = (
+    ('detect_rune.py', '--help'),
+    ('detect_rune.py', '--source', 'missing.jpg'),
+    ('train.py', '--help'),
+    ('roboflow_integration.py', '--help'),
+    ('benchmark_rune.py', '--help')
+)
+
+
+def synthetic_frames(count, width, height, seed=0):
+    """
+    Build reproducible BGR frames: seeded noise with a few filled shapes
+
+    Args:
+        count: Number of frames
+        width: Frame width
+        height: Frame height
+        seed: Random seed, so every run benchmarks identical pixels
+    """
+    import cv2
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(count):
+        frame = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+        for _ in range(int(rng.integers(2, 6))):
+            x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+            radius = int(rng.integers(8, max(9, min(width, height) // 8)))
+            color = tuple(int(c) for c in rng.integers(0, 256, size=3))
+            cv2.circle(frame, (x, y), radius, color, -1)
+        frames.append(frame)
+    return frames
+
+
+def sample_frames(source, count):
+    """Load up to ``count`` frames from an image directory or glob, cycling if there are fewer"""
+    import cv2
+
+    frames = [frame for frame in (cv2.imread(p) for p in collect_image_paths(source)) if frame is not None]
+    if not frames:
+        raise ValueError(f"No readable images in: {source}")
+    return list(itertools.islice(itertools.cycle(frames), count))
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None if unavailable"""
+    try:
+        import resource
+    except ImportError:
+        resource = None
+
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return round(getattr(info, 'peak_wset', info.rss) / (1024 * 1024), 1)
+    except ImportError:
+        return None
+
+
+def run_config(config):
+    """
+    Benchmark one configuration in the current process
+
+    Args:
+        config: Dict with model, backend, imgsz, batch_size, threads, dataset,
+            frames, warmup, width, height, seed and samples
+
+    Returns:
+        Dict of measurements
+    """
+    import numpy as np
+    import torch
+
+    if config['dataset'] == 'synthetic':
+        frames = synthetic_frames(config['frames'], config['width'], config['height'], config['seed'])
+    else:
+        frames = sample_frames(config['samples'], config['frames'])
+
+    detector = RuneDetector(model_path=config['model'], backend=config['backend'], imgsz=config['imgsz'])
+
+    batch_size = config['batch_size']
+    batches = [frames[i:i + batch_size] for i in range(0, len(frames), batch_size)]
+
+    # The first predict sets up ultralytics' predictor, which resets torch threads on CPU
+    detector.detect_frames(batches[0])
+    torch.set_num_threads(config['threads'])
+
+    for batch in batches[:config['warmup']]:
+        detector.detect_frames(batch)
+
+    latencies = []
+    start = time.perf_counter()
+    for batch in batches:
+        batch_start = time.perf_counter()
+        detector.detect_frames(batch)
+        latencies.append((time.perf_counter() - batch_start) * 1000)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'frames': len(frames),
+        'batches': len(batches),
+        'throughput_fps': round(len(frames) / elapsed, 2),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 2),
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def config_key(config):
+    """Identifier matching a run to its baseline entry"""
+    return (f"{config['dataset']}/{config['backend']}/imgsz{config['imgsz']}"
+            f"/batch{config['batch_size']}/threads{config['threads']}")
+
+
+def run_isolated(config, timeout=None):
+    """
+    Benchmark one configuration in a fresh Python process
+
+    A separate process per configuration keeps peak RSS and backend state
+    (thread pools, exported sessions) from leaking between runs.
+    """
+    command = [sys.executable, str(Path(__file__).resolve()), '--run-config', json.dumps(config)]
+    return run_json_process(command, timeout)
+
+
+def measure_startup(command, repeats=5):
+    """
+    Time fresh interpreter runs of one entry point command
+
+    Args:
+        command: Script name followed by its arguments
+        repeats: Number of runs; the median is reported
+
+    Returns:
+        Dict with median and first-run wall time in ms
+    """
+    repo_dir = Path(__file__).resolve().parent
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, *command], cwd=repo_dir, capture_output=True, text=True)
+        timings.append((time.perf_counter() - start) * 1000)
+        if completed.returncode not in (0, 2):
+            tail = (completed.stderr or completed.stdout).strip().splitlines()[-1:] or ['no output']
+            return {'error': tail[0]}
+    return {
+        'startup_ms': round(statistics.median(timings), 1),
+        'first_ms': round(timings[0], 1),
+        'repeats': repeats
+    }
+
+
+def benchmark_startup(args):
+    """Measure the cold start of every entry point, returning the report dict"""
+    runs = []
+    for command in STARTUP_COMMANDS:
+        key = 'startup/' + ' '.join(command)
+        print(key)
+        run = {'key': key, 'command': list(command)}
+        run.update(measure_startup(command, repeats=args.repeats))
+        runs.append(run)
+
+    print("\n" + "="*78)
+    print(f"{'command':<48}{'median ms':>12}{'first ms':>12}")
+    print("="*78)
+    for run in runs:
+        if 'error' in run:
+            print(f"{run['key']:<48}  error: {run['error']}")
+        else:
+            print(f"{run['key']:<48}{run['startup_ms']:>12.0f}{run['first_ms']:>12.0f}")
+    print("="*78)
+
+    return {
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'repeats': args.repeats,
+        'machine': machine_info(),
+        'runs': runs
+    }
+
+
+def benchmark_matrix(args):
+    """Measure every configuration of the backend/imgsz/batch/threads matrix, returning the report dict"""
+    width, height = (int(v) for v in args.frame_size.lower().split('x'))
+    datasets = ['synthetic'] + (['sample'] if args.samples else [])
+
+    configs = []
+    for dataset, backend, imgsz, batch_size, threads in itertools.product(
+            datasets, args.backends, args.imgsz, args.batch_sizes, args.threads):
+        configs.append({
+            'model': args.model,
+            'dataset': dataset,
+            'backend': backend,
+            'imgsz': imgsz,
+            'batch_size': batch_size,
+            'threads': threads,
+            'frames': args.frames,
+            'warmup': args.warmup,
+            'width': width,
+            'height': height,
+            'seed': args.seed,
+            'samples': args.samples
+        })
+
+    print(f"Benchmarking {len(configs)} configuration(s) with {args.model}")
+    runs = []
+    for i, config in enumerate(configs, 1):
+        key = config_key(config)
+        print(f"[{i}/{len(configs)}] {key}")
+        run = {'key': key, **{k: config[k] for k in ('dataset', 'backend', 'imgsz', 'batch_size', 'threads')}}
+        run.update(run_isolated(config, timeout=args.timeout))
+        if 'error' in run:
+            print(f"  Error: {run['error']}")
+        runs.append(run)
+
+    print_table(runs)
+
+    return {
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'model': args.model,
+        'model_hash': file_hash(args.model),
+        'frames': args.frames,
+        'frame_size': [width, height],
+        'seed': args.seed,
+        'samples': args.samples,
+        'machine': machine_info(),
+        'runs': runs
+    }
+
+
+def machine_info():
+    info = {
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version()
+    }
+    for package in ('torch', 'ultralytics', 'onnxruntime', 'openvino'):
+        try:
+            info[package] = version(package)
+        except PackageNotFoundError:
+            pass
+    return info
+
+
+def compare_to_baseline(runs, baseline, tolerance):
+    """
+    Compare runs against baseline runs with the same configuration
+
+    Args:
+        runs: Current run records
+        baseline: Baseline run records
+        tolerance: Allowed relative change in the worse direction (0.1 = 10%)
+
+    Returns:
+        List of regression messages (empty if none)
+    """
+    baseline_by_key = {run['key']: run for run in baseline if 'error' not in run}
+    regressions = []
+
+    print("\n" + "="*78)
+    print("Baseline comparison")
+    print("="*78)
+    for run in runs:
+        reference = baseline_by_key.get(run['key'])
+        if reference is None:
+            continue
+        if 'error' in run:
+            print(f"{run['key']:<48}failed: {run['error']}")
+            regressions.append(f"{run['key']} failed: {run['error']}")
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = reference.get(metric), run.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = change < -tolerance if higher_is_better else change > tolerance
+            marker = 'REGRESSION' if regressed else 'ok'
+            print(f"{run['key']:<48}{metric:<16}{old:>9.2f} -> {new:>9.2f} ({change * 100:+6.1f}%) {marker}")
+            if regressed:
+                regressions.append(f"{run['key']} {metric}: {old} -> {new} ({change * 100:+.1f}%)")
+    print("="*78)
+    return regressions
+
+
+def print_table(runs):
+    print("\n" + "="*78)
+    print(f"{'configuration':<48}{'fps':>8}{'p50 ms':>8}{'p99 ms':>8}{'RSS MB':>8}")
+    print("="*78)
+    for run in runs:
+        if 'error' in run:
+            print(f"{run['key']:<48}  error: {run['error']}")
+            continue
+        rss = f"{run['peak_rss_mb']:.0f}" if run['peak_rss_mb'] is not None else '-'
+        print(f"{run['key']:<48}{run['throughput_fps']:>8.1f}{run['p50_ms']:>8.1f}{run['p99_ms']:>8.1f}{rss:>8}")
+    print("="*78)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark YOLO12 rune detection')
+    parser.add_argument('--model', type=str, default='models/best.pt', help='Path to YOLO12 model (default: models/best.pt)')
+    parser.add_argument('--backends', type=str, nargs='+', default=['torch'], choices=BACKENDS,
+                        help='Inference backends to benchmark (default: torch)')
+    parser.add_argument('--imgsz', type=int, nargs='+', default=[640], help='Inference image sizes (default: 640)')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8], help='Frames per model call (default: 1 8)')
+    parser.add_argument('--threads', type=int, nargs='+', default=[os.cpu_count() or 1],
+                        help='Torch thread counts (default: all logical cores)')
+    parser.add_argument('--samples', type=str,
+                        help='Image directory or glob of real frames to benchmark in addition to synthetic ones')
+    parser.add_argument('--frames', type=int, default=64, help='Frames measured per configuration (default: 64)')
+    parser.add_argument('--warmup', type=int, default=2, help='Untimed warm-up batches per configuration (default: 2)')
+    parser.add_argument('--frame-size', type=str, default='1280x720', help='Synthetic frame size WxH (default: 1280x720)')
+    parser.add_argument('--seed', type=int, default=0, help='Synthetic frame random seed (default: 0)')
+    parser.add_argument('--timeout', type=float, default=1800, help='Seconds before a configuration is abandoned')
+    parser.add_argument('--output', type=str, help='Results JSON path (default: output/benchmark_<timestamp>.json)')
+    parser.add_argument('--baseline', type=str, help='Baseline results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Allowed relative regression per metric before failing (default: 0.10)')
+    parser.add_argument('--save-baseline', type=str, help='Also write the results to this path as the new baseline')
+    parser.add_argument('--startup', action='store_true',
+                        help='Benchmark cold-start time of each command instead of inference')
+    parser.add_argument('--repeats', type=int, default=5,
+                        help='Startup: fresh interpreter runs per command (default: 5)')
+    parser.add_argument('--run-config', type=str, help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    # Worker mode: measure one configuration and report it on stdout
+    if args.run_config:
+        print(json.dumps(run_config(json.loads(args.run_config))))
+        return
+
+    if args.startup:
+        report = benchmark_startup(args)
+    elif not Path(args.model).exists():
+        print(f"Error: Model not found: {args.model}")
+        sys.exit(2)
+    else:
+        report = benchmark_matrix(args)
+    runs = report['runs']
+
+    prefix = 'startup' if args.startup else 'benchmark'
+    output_path = args.output or str(Path('output') / f"{prefix}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    for path in filter(None, (output_path, args.save_baseline)):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved results to: {path}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('machine', {}).get('platform') != report['machine']['platform']:
+            print("Warning: Baseline was recorded on a different platform")
+        regressions = compare_to_baseline(runs, baseline['runs'], args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance * 100:.0f}% tolerance:")
+            for message in regressions:
+                print(f"  {message}")
+            sys.exit(1)
+        print("\nNo regressions against baseline")
+
+
+if __name__ == '__main__':
+    main()
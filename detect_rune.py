@@ -5,69 +5,526 @@ Detects runes in images, videos, or webcam feed using YOLOv12
 """
 
 import argparse
-import cv2
+import contextlib
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from ultralytics import YOLO
-import numpy as np
+
+# cv2, numpy, torch and ultralytics are imported where they are used, so
+# --help, argument errors and server-client lookups start without loading them
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.flv'}
+BACKENDS = ('torch', 'onnx', 'openvino')
+# Default torch threads per shard worker process
+SHARD_THREADS = 2
+
+
+class Detections:
+    """
+    Detections for one frame, stored as whole NumPy arrays
+
+    Attributes:
+        xyxy: (N, 4) float32 boxes in pixel coordinates
+        conf: (N,) float32 confidences
+        class_ids: (N,) int32 class ids
+        names: Mapping from class id to class name
+        source: Image path or frame index the detections belong to (optional)
+        orig_shape: (height, width) of the frame (optional)
+    """
+
+    def __init__(self, xyxy, conf, class_ids, names, source=None, orig_shape=None):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.class_ids = class_ids
+        self.names = names
+        self.source = source
+        self.orig_shape = orig_shape
+
+    @classmethod
+    def from_result(cls, result, names, source=None):
+        """
+        Build from an ultralytics Results with a single tensor-to-NumPy transfer
+
+        Args:
+            result: ultralytics Results for one frame
+            names: Mapping from class id to class name
+            source: Image path or frame index (optional)
+        """
+        import numpy as np
+
+        data = result.boxes.data.cpu().numpy()
+        return cls(
+            xyxy=data[:, :4].astype(np.float32, copy=False),
+            conf=data[:, 4].astype(np.float32, copy=False),
+            class_ids=data[:, 5].astype(np.int32),
+            names=names,
+            source=source,
+            orig_shape=tuple(result.orig_shape)
+        )
+
+    def __len__(self):
+        return len(self.conf)
+
+    def class_names(self):
+        """Class name of every detection"""
+        return [self.names[i] for i in self.class_ids.tolist()]
+
+    def to_list(self):
+        """JSON-serializable list of per-detection dicts"""
+        import numpy as np
+
+        return [
+            {'class_id': cls, 'class_name': self.names[cls], 'confidence': conf, 'box': box}
+            for cls, conf, box in zip(
+                self.class_ids.tolist(),
+                np.round(self.conf.astype(np.float64), 4).tolist(),
+                np.round(self.xyxy.astype(np.float64), 1).tolist()
+            )
+        ]
+
+    def print_summary(self):
+        """Print the detection count and one line per detection"""
+        print(f"Found {len(self)} rune(s)")
+        for i, (name, conf) in enumerate(zip(self.class_names(), self.conf.tolist())):
+            print(f"  Rune {i+1}: {name} (confidence: {conf:.2f})")
 
 
 class RuneDetector:
     """Rune detection using YOLO12 model"""
 
-    def __init__(self, model_path='yolo12n.pt', conf_threshold=0.25, iou_threshold=0.45):
+    def __init__(self, model_path='yolo12n.pt', conf_threshold=0.25, iou_threshold=0.45,
+                 backend='torch', imgsz=640, tile_size=None, tile_overlap=0.2, tile_full_frame=True,
+                 tile_merge='nms', cache_dir=None, cache_size_mb=512, metrics=None, thread_profile=None,
+                 cascade_model=None, cascade_band=(0.1, 0.5), cascade_crops=False):
         """
         Initialize the rune detector
 
         Args:
-            model_path: Path to YOLO12 model weights
+            model_path: Path to YOLO12 model weights (.pt), or an exported
+                .onnx file / *_openvino_model directory
             conf_threshold: Confidence threshold for detections
             iou_threshold: IoU threshold for NMS
+            backend: Inference backend: 'torch', 'onnx' or 'openvino'.
+                Non-torch backends export the .pt weights on first use and
+                reuse the cached artifact afterwards
+            imgsz: Inference image size
+            tile_size: Enable tiled inference with square tiles of this size, so
+                small runes in high-resolution frames are seen at full resolution
+            tile_overlap: Fraction of overlap between neighbouring tiles
+            tile_full_frame: Also run a downscaled full-frame pass with the tiles,
+                for runes larger than a tile
+            tile_merge: How duplicates across tiles are merged: 'nms' or 'wbf'
+            cache_dir: Enable the on-disk result cache in this directory, so
+                re-submitted images skip decoding and inference
+            cache_size_mb: Result cache size before least recently used entries are evicted
+            metrics: rune_metrics.StageMetrics recording per-stage frame latencies (optional)
+            thread_profile: Dict of torch_threads / interop_threads / cv2_threads to run
+                with, e.g. the machine profile from rune_tuning.load_profile('inference')
+            cascade_model: Slower, more accurate secondary model (e.g. yolo12m weights);
+                ``model_path`` then acts as the fast primary model and the secondary
+                model only runs where the primary one is unsure
+            cascade_band: (low, high) primary confidence range treated as unsure. A
+                frame escalates when its top primary confidence falls in the band;
+                primary boxes down to ``low`` are considered even below conf_threshold
+            cascade_crops: Run the secondary model on padded crops around the unsure
+                boxes instead of the whole frame
         """
         self.model_path = model_path
+        self.metrics = metrics
         self.conf_threshold = conf_threshold
         self.iou_threshold = iou_threshold
+        self.imgsz = imgsz
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.tile_full_frame = tile_full_frame
+        self.tile_merge = tile_merge
+        self.backend = detect_backend(model_path) or backend
+
+        if cascade_model and tile_size:
+            raise ValueError("Cascade inference cannot be combined with tiled inference")
+
+        # Imported here so server clients and argument errors skip the torch startup
+        import numpy as np
+
+        self.model, model_path = self._load_model(model_path)
+
+        self.secondary_model = None
+        self.cascade_model_path = cascade_model
+        self.cascade_band = cascade_band
+        self.cascade_crops = cascade_crops
+        self.cascade_stats = {'frames': 0, 'escalated': 0, 'crops': 0, 'primary_s': 0.0, 'secondary_s': 0.0}
+        if cascade_model:
+            self.secondary_model, cascade_model = self._load_model(cascade_model)
+            target = 'crops around boxes with' if cascade_crops else 'frames with top'
+            print(f"Cascade: secondary model runs on {target} primary confidence in "
+                  f"[{cascade_band[0]:.2f}, {cascade_band[1]:.2f})")
+
+        if thread_profile:
+            from rune_tuning import apply_threads, describe
+
+            # The first predict sets up ultralytics' predictor, which resets torch threads on CPU
+            for model in (self.model, self.secondary_model):
+                if model is not None:
+                    model.predict(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, verbose=False)
+            apply_threads(thread_profile)
+            print(f"Thread settings: {describe(thread_profile)}")
+
+        self.cache = None
+        if cache_dir:
+            from rune_cache import ResultCache
+
+            settings = {
+                'weights': file_hash(model_path) if Path(model_path).exists() else str(model_path),
+                'conf': self.conf_threshold,
+                'iou': self.iou_threshold,
+                'imgsz': self.imgsz,
+                'tile_size': self.tile_size,
+                'tile_overlap': self.tile_overlap,
+                'tile_full_frame': self.tile_full_frame,
+                'tile_merge': self.tile_merge
+            }
+            if cascade_model:
+                settings['cascade'] = [file_hash(cascade_model) if Path(cascade_model).exists() else str(cascade_model),
+                                       list(cascade_band), cascade_crops]
+            self.cache = ResultCache(cache_dir, settings, max_bytes=cache_size_mb * 1024 * 1024)
+
+    def settings(self):
+        """Options that change detection results, normalized for comparison with detection_settings()"""
+        return detection_settings(
+            self.model_path, self.backend, self.conf_threshold, self.iou_threshold, self.imgsz,
+            self.tile_size, self.tile_overlap, self.tile_full_frame, self.tile_merge,
+            self.cascade_model_path, self.cascade_band, self.cascade_crops
+        )
+
+    def _load_model(self, model_path):
+        """
+        Load weights with the detector's backend, exporting and caching .pt weights for non-torch backends
+
+        Returns:
+            (YOLO model, path actually loaded)
+        """
+        from ultralytics import YOLO
+
+        if self.backend != 'torch' and str(model_path).endswith('.pt'):
+            model_path = export_cached(model_path, self.backend, self.imgsz)
 
-        print(f"Loading YOLO12 model from {model_path}...")
-        self.model = YOLO(model_path)
+        print(f"Loading YOLO12 model from {model_path} (backend: {self.backend})...")
+        if self.backend == 'torch':
+            model = YOLO(model_path)
+        else:
+            model = YOLO(model_path, task='detect')
         print("Model loaded successfully!")
+        return model, model_path
 
-    def detect_image(self, image_path, output_path=None, show=True):
+    def _predict(self, source):
         """
-        Detect runes in a single image
+        Run the model with the detector's thresholds
 
         Args:
-            image_path: Path to input image
-            output_path: Path to save output image (optional)
-            show: Whether to display the result
+            source: Image path, frame array, or a list of them (one batch)
+
+        Returns:
+            List of ultralytics Results, one per input
         """
-        print(f"\nProcessing image: {image_path}")
+        if self.tile_size:
+            sources = source if isinstance(source, list) else [source]
+            return [self._predict_tiled(_load_image(s)) for s in sources]
+        if self.secondary_model is not None:
+            return self._predict_cascade(source)
+
+        return self.model.predict(
+            source=source,
+            conf=self.conf_threshold,
+            iou=self.iou_threshold,
+            imgsz=self.imgsz,
+            save=False,
+            verbose=False
+        )
+
+    def _predict_cascade(self, source):
+        """
+        Run the primary model, escalating unsure frames or boxes to the secondary model
+
+        The primary model runs at the lower edge of the cascade band so that
+        weak candidates are visible. Frames whose top primary confidence falls
+        in the band go to the secondary model, either whole or as padded crops
+        around each box in the band; all other frames keep the primary boxes
+        that pass conf_threshold. Escalated work is batched per call.
+
+        Returns:
+            List of ultralytics Results, one per input
+        """
+        import numpy as np
+
+        low, high = self.cascade_band
+        frames = [_load_image(s) for s in (source if isinstance(source, list) else [source])]
+
+        start = time.perf_counter()
+        primary = self.model.predict(
+            source=frames,
+            conf=min(low, self.conf_threshold),
+            iou=self.iou_threshold,
+            imgsz=self.imgsz,
+            save=False,
+            verbose=False
+        )
+        self.cascade_stats['primary_s'] += time.perf_counter() - start
+
+        outputs = []
+        escalated = []
+        for i, (frame, result) in enumerate(zip(frames, primary)):
+            data = result.boxes.data.cpu().numpy()
+            unsure = (data[:, 4] >= low) & (data[:, 4] < high)
+            top = data[:, 4].max() if len(data) else 0.0
+            escalate = low <= top < high or (self.cascade_crops and unsure.any())
+            passing = data[:, 4] >= self.conf_threshold
+            if escalate:
+                escalated.append(i)
+                # The secondary model decides on the unsure boxes
+                passing &= ~unsure
+            outputs.append((frame, data[passing], unsure, data, dict(result.speed)))
+
+        self.cascade_stats['frames'] += len(frames)
+        self.cascade_stats['escalated'] += len(escalated)
+        if escalated:
+            start = time.perf_counter()
+            if self.cascade_crops:
+                self._escalate_crops(outputs, escalated)
+            else:
+                self._escalate_frames(outputs, escalated)
+            self.cascade_stats['secondary_s'] += time.perf_counter() - start
+
+        results = []
+        for frame, keep, _, _, speed in outputs:
+            result = self._wrap_result(frame, np.ascontiguousarray(keep, dtype=np.float32))
+            result.speed = speed
+            results.append(result)
+        return results
+
+    def _predict_secondary(self, images):
+        return self.secondary_model.predict(
+            source=images,
+            conf=self.conf_threshold,
+            iou=self.iou_threshold,
+            imgsz=self.imgsz,
+            save=False,
+            verbose=False
+        )
+
+    def _escalate_frames(self, outputs, escalated):
+        """Replace the boxes of escalated frames with the secondary model's detections"""
+        results = self._predict_secondary([outputs[i][0] for i in escalated])
+        for i, result in zip(escalated, results):
+            frame, _, unsure, data, speed = outputs[i]
+            _add_speed(speed, result.speed)
+            outputs[i] = (frame, result.boxes.data.cpu().numpy(), unsure, data, speed)
+
+    def _escalate_crops(self, outputs, escalated, pad=0.25, min_size=32):
+        """Re-check each unsure primary box on a padded crop and merge the secondary boxes back in"""
+        import numpy as np
+
+        crops = []
+        owners = []
+        for i in escalated:
+            frame, _, unsure, data, _ = outputs[i]
+            height, width = frame.shape[:2]
+            for x1, y1, x2, y2 in data[unsure, :4]:
+                margin_x = max((x2 - x1) * pad, (min_size - (x2 - x1)) / 2, 0)
+                margin_y = max((y2 - y1) * pad, (min_size - (y2 - y1)) / 2, 0)
+                cx1, cy1 = int(max(x1 - margin_x, 0)), int(max(y1 - margin_y, 0))
+                cx2, cy2 = int(min(x2 + margin_x, width)), int(min(y2 + margin_y, height))
+                crops.append(frame[cy1:cy2, cx1:cx2])
+                owners.append((i, cx1, cy1))
+        self.cascade_stats['crops'] += len(crops)
+
+        found = {i: [outputs[i][1]] for i in escalated}
+        for (i, x, y), result in zip(owners, self._predict_secondary(crops)):
+            _add_speed(outputs[i][4], result.speed)
+            boxes = result.boxes.data.cpu().numpy()
+            if len(boxes):
+                boxes = boxes.copy()
+                boxes[:, [0, 2]] += x
+                boxes[:, [1, 3]] += y
+                found[i].append(boxes)
+
+        for i, parts in found.items():
+            frame, _, unsure, data, speed = outputs[i]
+            merged = np.concatenate(parts).astype(np.float32)
+            if len(merged):
+                # Overlapping crops can find the same rune twice
+                merged = merged[nms(merged, self.iou_threshold)]
+            outputs[i] = (frame, merged, unsure, data, speed)
+
+    def cascade_report(self):
+        """Print how many frames escalated to the secondary model and the resulting throughput"""
+        stats = self.cascade_stats
+        if self.secondary_model is None or not stats['frames']:
+            return
+        frames = stats['frames']
+        total_s = stats['primary_s'] + stats['secondary_s']
+        primary_fps = frames / stats['primary_s'] if stats['primary_s'] > 0 else 0
+        effective_fps = frames / total_s if total_s > 0 else 0
+        crops = f", {stats['crops']} crop(s)" if self.cascade_crops else ""
+        print(f"Cascade: {stats['escalated']}/{frames} frames escalated to the secondary model "
+              f"({stats['escalated'] / frames * 100:.1f}%{crops})")
+        print(f"Cascade throughput: {effective_fps:.1f} FPS effective, {primary_fps:.1f} FPS primary model alone")
+
+    def _predict_tiled(self, frame):
+        """
+        Detect runes in overlapping tiles of one frame and merge them
+
+        All tiles (plus the optional full-frame pass) go to the model as one
+        batch. Tile boxes are shifted back to full-frame coordinates and
+        duplicates from overlapping tiles are merged with NMS or WBF.
+
+        Returns:
+            ultralytics Results for the whole frame
+        """
+        import numpy as np
+
+        origins = tile_origins(frame.shape[:2], self.tile_size, self.tile_overlap)
+        crops = [frame[y:y + self.tile_size, x:x + self.tile_size] for x, y in origins]
+        if self.tile_full_frame and len(origins) > 1:
+            crops.append(frame)
+            origins.append((0, 0))
 
-        # Run inference
         results = self.model.predict(
-            source=image_path,
+            source=crops,
             conf=self.conf_threshold,
             iou=self.iou_threshold,
+            imgsz=self.imgsz,
             save=False,
             verbose=False
         )
 
-        # Get annotated image
-        annotated_img = results[0].plot()
+        merge_start = time.perf_counter()
+        parts = []
+        for (x, y), result in zip(origins, results):
+            data = result.boxes.data.cpu().numpy()
+            if len(data):
+                data = data.copy()
+                data[:, [0, 2]] += x
+                data[:, [1, 3]] += y
+                parts.append(data)
+        merged = np.concatenate(parts) if parts else np.zeros((0, 6), dtype=np.float32)
+
+        if self.tile_merge == 'wbf':
+            merged = weighted_boxes_fusion(merged, self.iou_threshold)
+        else:
+            merged = merged[nms(merged, self.iou_threshold)]
+
+        merged_result = self._wrap_result(frame, merged)
+        # Per-frame cost is the sum over its tiles, with the cross-tile merge counted as postprocess
+        merged_result.speed = {
+            stage: sum(result.speed.get(stage) or 0.0 for result in results)
+            for stage in ('preprocess', 'inference', 'postprocess')
+        }
+        merged_result.speed['postprocess'] += (time.perf_counter() - merge_start) * 1000
+        return merged_result
+
+    def _wrap_result(self, frame, data):
+        """ultralytics Results for an (N, 6) x1, y1, x2, y2, confidence, class id array"""
+        import torch
+        from ultralytics.engine.results import Results
+
+        return Results(frame, path='', names=self.model.names, boxes=torch.from_numpy(data))
+
+    def _stage(self, stage):
+        """Time a block under ``stage`` when metrics are enabled"""
+        return self.metrics.time(stage) if self.metrics else contextlib.nullcontext()
+
+    def _record_speed(self, result):
+        """Record the model's own preprocess/inference/postprocess timings for one frame"""
+        for stage, ms in (getattr(result, 'speed', None) or {}).items():
+            if ms is not None:
+                self.metrics.record(stage, ms)
+
+    def _to_detections(self, result, source=None):
+        """Wrap one Results object as Detections"""
+        return Detections.from_result(result, self.model.names, source=source)
+
+    def _cache_get(self, key, source=None):
+        """Return cached Detections for a cache key, or None"""
+        entry = self.cache.get(key) if key else None
+        if entry is None:
+            return None
+        return Detections(entry['xyxy'], entry['conf'], entry['class_ids'], self.model.names,
+                          source=source, orig_shape=tuple(entry['orig_shape'].tolist()))
+
+    def _cache_put(self, key, detections):
+        if key:
+            self.cache.put(key, detections.xyxy, detections.conf, detections.class_ids, detections.orig_shape)
+
+    def detect_frames(self, frames):
+        """
+        Detect runes in decoded frames with one batched model call
+
+        Args:
+            frames: List of BGR frame arrays
+
+        Returns:
+            List of Detections, one per frame
+        """
+        return [self._to_detections(result, source=i) for i, result in enumerate(self._predict(list(frames)))]
+
+    def detect_image(self, image_path, output_path=None, show=True):
+        """
+        Detect runes in a single image
+
+        Args:
+            image_path: Path to input image
+            output_path: Path to save output image (optional)
+            show: Whether to display the result
+
+        Returns:
+            Detections for the image
+        """
+        import cv2
+
+        print(f"\nProcessing image: {image_path}")
+
+        frame = None
+        key = self.cache.key_for_file(image_path) if self.cache else None
+        detections = self._cache_get(key, source=image_path)
+
+        if detections is not None:
+            print("Using cached result")
+        else:
+            for _, _, detections, frame in self.stream(image_path, with_frames=True):
+                break
+            else:
+                print(f"Error: Could not read image: {image_path}")
+                return None
+            self._cache_put(key, detections)
 
         # Print detection results
-        detections = results[0].boxes
-        print(f"Found {len(detections)} rune(s)")
+        detections.print_summary()
+
+        # Nothing to draw in headless mode
+        if not show and not output_path:
+            return detections
 
-        for i, box in enumerate(detections):
-            conf = box.conf[0].item()
-            cls = int(box.cls[0].item())
-            class_name = self.model.names[cls]
-            print(f"  Rune {i+1}: {class_name} (confidence: {conf:.2f})")
+        if frame is None:
+            frame = cv2.imread(str(image_path))
+        with self._stage('annotation'):
+            annotated_img = draw_detections(frame, detections)
 
         # Save output
         if output_path:
-            cv2.imwrite(output_path, annotated_img)
+            with self._stage('encode'):
+                cv2.imwrite(output_path, annotated_img)
             print(f"Saved result to: {output_path}")
 
         # Display
@@ -76,9 +533,102 @@ class RuneDetector:
             cv2.waitKey(0)
             cv2.destroyAllWindows()
 
-        return results
+        return detections
+
+    def detect_batch(self, image_paths, results_path=None, batch_size=16, workers=4):
+        """
+        Detect runes in many images using batched inference
+
+        Images are decoded by a background thread pool while the model runs,
+        and sent to the model in fixed-size batches.
+
+        Args:
+            image_paths: List of image paths
+            results_path: Path to the JSON Lines results file (optional)
+            batch_size: Number of images per model call
+            workers: Number of image decoding threads
+
+        Returns:
+            List of Detections for the readable images, in input order
+        """
+        image_paths = [str(p) for p in image_paths]
+        total = len(image_paths)
+        print(f"\nProcessing {total} image(s) in batches of {batch_size}")
+
+        results_file = None
+        if results_path:
+            Path(results_path).parent.mkdir(parents=True, exist_ok=True)
+            results_file = open(results_path, 'w', encoding='utf-8')
+
+        # Results arrive out of order (cache hits first), so they are written
+        # once every earlier image has one; False marks an unreadable image
+        slots = [None] * total
+        written = 0
+        processed = 0
+        start_time = time.time()
+
+        def emit(position, detections):
+            nonlocal written, processed
+            slots[position] = detections
+            if detections is not False:
+                processed += 1
+                if processed % (batch_size * 10) == 0:
+                    print(f"Processed {processed}/{total} images ({processed/total*100:.1f}%)")
+            while written < total and slots[written] is not None:
+                if results_file:
+                    if slots[written] is False:
+                        record = {'image': image_paths[written], 'error': 'unreadable'}
+                    else:
+                        record = {'image': image_paths[written], 'detections': slots[written].to_list()}
+                    results_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+                written += 1
 
-    def detect_video(self, video_path, output_path=None, show=True):
+        # Cache hits only cost a file hash; the rest go to the model
+        keys = {}
+        pending = list(range(total))
+        if self.cache:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                keys = dict(zip(image_paths, pool.map(self.cache.key_for_file, image_paths)))
+            pending = []
+            for position, path in enumerate(image_paths):
+                cached = self._cache_get(keys[path], source=path)
+                if cached is None:
+                    pending.append(position)
+                else:
+                    emit(position, cached)
+
+        try:
+            # stream() skips unreadable images; the pending ones it passed over are recorded as such
+            skipped = 0
+            if pending:
+                pending_paths = [image_paths[position] for position in pending]
+                for index, _, detections in self.stream(pending_paths, batch_size=batch_size, workers=workers):
+                    for position in pending[skipped:index]:
+                        emit(position, False)
+                    skipped = index + 1
+                    self._cache_put(keys.get(detections.source), detections)
+                    emit(pending[index], detections)
+            for position in pending[skipped:]:
+                emit(position, False)
+        finally:
+            if results_file:
+                results_file.close()
+
+        all_detections = [d for d in slots if d is not None and d is not False]
+        elapsed = time.time() - start_time
+        num_detections = sum(len(d) for d in all_detections)
+        print(f"\nProcessed {total} images, found {num_detections} rune(s)")
+        print(f"Throughput: {total / elapsed if elapsed > 0 else 0:.1f} images/sec ({elapsed:.1f}s)")
+        if self.cache:
+            self.cache.report()
+        if results_path:
+            print(f"Saved results to: {results_path}")
+
+        return all_detections
+
+    def detect_video(self, video_path, output_path=None, show=True, pipelined=False, queue_size=8,
+                     motion_threshold=None, motion_refresh=30, detect_every=None, adaptive_interval=False,
+                     clip_dir=None, pre_roll=2.0, post_roll=2.0, shared_memory=False, ring_slots=8):
         """
         Detect runes in a video file
 
@@ -86,16 +636,42 @@ class RuneDetector:
             video_path: Path to input video
             output_path: Path to save output video (optional)
             show: Whether to display the result
+            pipelined: Run decode and inference on separate threads, overlapping
+                them with annotation/encoding on the calling thread
+            queue_size: Frames buffered between pipeline stages (pipelined only)
+            motion_threshold: Skip inference and reuse the previous detections when
+                the mean downscaled pixel change is below this value (None: off)
+            motion_refresh: Force inference at least every N frames with motion gating
+            detect_every: Run the detector every N frames and move boxes with
+                optical flow in between (None: detect every frame)
+            adaptive_interval: Let the tracker grow or shrink N with tracking quality
+            clip_dir: Write only short annotated clips around detections, plus a
+                detections sidecar file, to this directory (optional)
+            pre_roll: Seconds of video kept before the first detection of a clip
+            post_roll: Seconds of video kept after the last detection of a clip
+            shared_memory: Decode, detect and render in separate processes that
+                share frames through a SharedFrameRing (pipelined and clips unused)
+            ring_slots: Frame slots in the shared ring (shared_memory only)
+
+        Returns:
+            List of Detections, one per processed frame
         """
-        print(f"\nProcessing video: {video_path}")
+        import cv2
 
-        cap = cv2.VideoCapture(video_path)
+        if shared_memory:
+            return self.detect_shared(video_path, output_path=output_path, show=show, slots=ring_slots,
+                                      motion_threshold=motion_threshold, motion_refresh=motion_refresh,
+                                      detect_every=detect_every, adaptive_interval=adaptive_interval)
+
+        print(f"\nProcessing video: {video_path}")
 
         # Get video properties
+        cap = cv2.VideoCapture(video_path)
         width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         fps = int(cap.get(cv2.CAP_PROP_FPS))
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
 
         # Setup video writer
         writer = None
@@ -103,42 +679,52 @@ class RuneDetector:
             fourcc = cv2.VideoWriter_fourcc(*'mp4v')
             writer = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
 
+        recorder = None
+        if clip_dir:
+            recorder = ClipRecorder(clip_dir, Path(video_path).stem, fps or 30, (width, height), self.model.names,
+                                    pre_roll=pre_roll, post_roll=post_roll)
+
         frame_count = 0
+        frame_detections = []
         start_time = time.time()
 
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
+        gate = MotionGate(motion_threshold, motion_refresh) if motion_threshold is not None else None
+        tracker = FlowTracker(detect_every, adaptive=adaptive_interval) if detect_every else None
+        frames = self.stream(video_path, pipelined=pipelined, queue_size=queue_size,
+                             motion_gate=gate, tracker=tracker, with_frames=True)
 
-            frame_count += 1
+        # Headless (no window, no output video or clips): detections only, no drawing
+        render = show or writer is not None or recorder is not None
 
-            # Run detection
-            results = self.model.predict(
-                source=frame,
-                conf=self.conf_threshold,
-                iou=self.iou_threshold,
-                save=False,
-                verbose=False
-            )
+        for index, timestamp, detections, frame in frames:
+            frame_detections.append(detections)
+            frame_count += 1
 
-            # Get annotated frame
-            annotated_frame = results[0].plot()
+            if render:
+                with self._stage('annotation'):
+                    # Draw in place on the decoded frame (detections may be reused from an earlier frame)
+                    draw_detections(frame, detections)
 
-            # Add FPS counter
-            elapsed = time.time() - start_time
-            current_fps = frame_count / elapsed if elapsed > 0 else 0
-            cv2.putText(annotated_frame, f'FPS: {current_fps:.1f}',
-                       (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+                    # Add FPS counter
+                    elapsed = time.time() - start_time
+                    current_fps = frame_count / elapsed if elapsed > 0 else 0
+                    cv2.putText(frame, f'FPS: {current_fps:.1f}',
+                               (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
 
             # Write frame
             if writer:
-                writer.write(annotated_frame)
+                with self._stage('encode'):
+                    writer.write(frame)
+            if recorder:
+                with self._stage('encode'):
+                    recorder.add(index, timestamp, frame, detections)
 
             # Display
             if show:
-                cv2.imshow('Rune Detection', annotated_frame)
-                if cv2.waitKey(1) & 0xFF == ord('q'):
+                with self._stage('display'):
+                    cv2.imshow('Rune Detection', frame)
+                    key = cv2.waitKey(1) & 0xFF
+                if key == ord('q'):
                     print("\nStopped by user")
                     break
 
@@ -146,134 +732,2011 @@ class RuneDetector:
             if frame_count % 30 == 0:
                 print(f"Processed {frame_count}/{total_frames} frames ({frame_count/total_frames*100:.1f}%)")
 
-        cap.release()
+        frames.close()
         if writer:
             writer.release()
-        cv2.destroyAllWindows()
+        if recorder:
+            recorder.close()
+        if show:
+            cv2.destroyAllWindows()
 
-        print(f"\nProcessed {frame_count} frames")
+        elapsed = time.time() - start_time
+        print(f"\nProcessed {frame_count} frames ({frame_count / elapsed if elapsed > 0 else 0:.1f} FPS)")
+        if gate:
+            gate.report()
+        if tracker:
+            tracker.report()
         if output_path:
             print(f"Saved result to: {output_path}")
+        if recorder:
+            recorder.report(frame_count)
+
+        return frame_detections
 
-    def detect_webcam(self, camera_id=0):
+    def stream(self, source, batch_size=1, workers=4, pipelined=False, queue_size=8,
+               motion_gate=None, tracker=None, with_frames=False):
         """
-        Detect runes in real-time from webcam
+        Lazily detect runes in frames from any source
+
+        Timestamps are media time in seconds for video files opened by path,
+        and wall-clock time.time() when the frame was obtained otherwise.
 
         Args:
-            camera_id: Camera device ID (default: 0)
+            source: Image or video path, image directory or glob pattern, list of
+                image paths, camera id (int), opened cv2.VideoCapture,
+                LatestFrameReader, or any iterable of BGR frame arrays
+            batch_size: Frames per model call
+            workers: Decoding threads for image path sources
+            pipelined: Read frames and run the model on separate threads (batch_size 1)
+            queue_size: Frames buffered between pipeline stages (pipelined only)
+            motion_gate: MotionGate used to reuse detections for unchanged frames (batch_size 1)
+            tracker: FlowTracker moving boxes between detector runs (batch_size 1)
+            with_frames: Also yield the decoded frame
+
+        Yields:
+            (frame_index, timestamp, detections), or
+            (frame_index, timestamp, detections, frame) with ``with_frames``
         """
-        print(f"\nStarting webcam detection (camera {camera_id})")
-        print("Press 'q' to quit")
+        frames = self._iter_frames(source, workers=workers, prefetch=max(batch_size * 2, 8))
+        if self.metrics:
+            frames = self.metrics.timed_iter(frames, 'decode')
+        if batch_size > 1:
+            predictions = self._iter_batched(frames, batch_size)
+        elif pipelined:
+            predictions = self._iter_pipelined(frames, queue_size, motion_gate, tracker)
+        else:
+            predictions = self._iter_sequential(frames, motion_gate, tracker)
 
-        cap = cv2.VideoCapture(camera_id)
+        previous = None
+        try:
+            for index, timestamp, frame, tag, result in predictions:
+                # Motion-gated frames reuse the previous result and cost no model time
+                if self.metrics and result is not previous:
+                    self._record_speed(result)
+                previous = result
+                detections = self._to_detections(result, source=tag)
+                if with_frames:
+                    yield index, timestamp, detections, frame
+                else:
+                    yield index, timestamp, detections
+        finally:
+            # Stop pipeline threads before closing the frame source they read from
+            predictions.close()
+            frames.close()
 
-        if not cap.isOpened():
-            print(f"Error: Could not open camera {camera_id}")
+    def _iter_frames(self, source, workers=4, prefetch=8):
+        """Yield (frame_index, timestamp, frame, tag) from any source accepted by stream()"""
+        import cv2
+
+        if isinstance(source, LatestFrameReader):
+            index = 0
+            while True:
+                ok, frame, captured_at = source.read(timeout=2.0)
+                if not ok:
+                    return
+                yield index, captured_at, frame, index
+                index += 1
+
+        if isinstance(source, cv2.VideoCapture):
+            yield from _iter_capture(source, live=True)
             return
 
-        frame_count = 0
+        if isinstance(source, int):
+            cap = cv2.VideoCapture(source)
+            try:
+                yield from _iter_capture(cap, live=True)
+            finally:
+                cap.release()
+            return
+
+        if isinstance(source, (str, Path)):
+            path = Path(source)
+            if path.is_dir() or glob.has_magic(str(source)):
+                source = collect_image_paths(str(source))
+            elif path.suffix.lower() in IMAGE_EXTENSIONS:
+                source = [str(path)]
+            elif path.suffix.lower() in VIDEO_EXTENSIONS:
+                cap = cv2.VideoCapture(str(path))
+                try:
+                    yield from _iter_capture(cap, live=False)
+                finally:
+                    cap.release()
+                return
+            else:
+                raise ValueError(f"Unsupported source: {source}")
+
+        if isinstance(source, (list, tuple)) and source and isinstance(source[0], (str, Path)):
+            paths = [str(p) for p in source]
+            for index, (path, frame) in enumerate(_decode_images(paths, workers=workers, prefetch=prefetch)):
+                if frame is None:
+                    print(f"Warning: Could not read image: {path}")
+                    continue
+                yield index, time.time(), frame, path
+            return
+
+        for index, frame in enumerate(source):
+            yield index, time.time(), frame, index
+
+    def _predict_gated(self, frame, gate, previous, tracker=None):
+        """Run inference unless the motion gate says the frame is unchanged or the tracker can follow it"""
+        if gate is not None and not gate.should_infer(frame):
+            return previous
+        if tracker is not None:
+            return self._predict_tracked(frame, tracker)
+        return self._predict(frame)[0]
+
+    def _predict_tracked(self, frame, tracker):
+        """Detect when the tracker is due or lost its boxes, otherwise move the boxes with optical flow"""
+        data = None
+        if not tracker.due():
+            with self._stage('tracking'):
+                data = tracker.track(frame)
+        if data is None:
+            result = self._predict(frame)[0]
+            tracker.reset(frame, result.boxes.data.cpu().numpy())
+            return result
+        return self._wrap_result(frame, data)
+
+    def _iter_sequential(self, frames, gate=None, tracker=None):
+        """Detect frames one after another, yielding (index, timestamp, frame, tag, result)"""
+        result = None
+        for index, timestamp, frame, tag in frames:
+            result = self._predict_gated(frame, gate, result, tracker)
+            yield index, timestamp, frame, tag, result
+
+    def _iter_batched(self, frames, batch_size):
+        """Detect frames in fixed-size batches, yielding (index, timestamp, frame, tag, result)"""
+        batch = []
+        for item in frames:
+            batch.append(item)
+            if len(batch) == batch_size:
+                yield from self._predict_batch(batch)
+                batch = []
+        if batch:
+            yield from self._predict_batch(batch)
+
+    def _predict_batch(self, batch):
+        results = self._predict([frame for _, _, frame, _ in batch])
+        for (index, timestamp, frame, tag), result in zip(batch, results):
+            yield index, timestamp, frame, tag, result
+
+    def _iter_pipelined(self, frames, queue_size=8, gate=None, tracker=None):
+        """
+        Yield (index, timestamp, frame, tag, result) with reading and inference on worker threads
+
+        The frame source, the model and the caller (annotation/encoding) each
+        run in their own thread, joined by bounded queues. OpenCV and torch
+        release the GIL in their heavy calls, so the stages overlap. Each
+        stage has a single consumer, which keeps frames in order, and the
+        bounded queues block a fast stage instead of buffering the video.
+        An exception in either worker ends the stream and is re-raised here.
+        """
+        decoded = queue.Queue(maxsize=queue_size)
+        predicted = queue.Queue(maxsize=queue_size)
+        stop = threading.Event()
+        end = object()
+        errors = []
+
+        def decode():
+            try:
+                for item in frames:
+                    if stop.is_set() or not _put_until_stopped(decoded, item, stop):
+                        break
+            except Exception as e:
+                errors.append(e)
+            finally:
+                _put_until_stopped(decoded, end, stop)
+
+        def infer():
+            result = None
+            try:
+                while not stop.is_set():
+                    try:
+                        item = decoded.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    if item is end:
+                        break
+                    result = self._predict_gated(item[2], gate, result, tracker)
+                    _put_until_stopped(predicted, (*item, result), stop)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                _put_until_stopped(predicted, end, stop)
+
+        threads = [threading.Thread(target=decode, name='rune-decode', daemon=True),
+                   threading.Thread(target=infer, name='rune-infer', daemon=True)]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = predicted.get()
+                if item is end:
+                    break
+                yield item
+            if errors:
+                raise errors[0]
+        finally:
+            # Unblock workers if the caller stopped early
+            stop.set()
+            for q in (decoded, predicted):
+                while not q.empty():
+                    q.get_nowait()
+            for thread in threads:
+                thread.join()
+
+    def stream_multi(self, sources, batch_size=None, buffer_size=4):
+        """
+        Detect runes in several cameras and video files at once with this one model
+
+        Frames from all sources are interleaved round-robin into shared
+        batches, so one model copy serves every stream.
+
+        Args:
+            sources: Camera ids and/or video paths, or a MultiSourceReader
+            batch_size: Frames per model call (default: number of sources)
+            buffer_size: Frames buffered per source
+
+        Yields:
+            (stream_id, frame_index, timestamp, detections, frame); stream_id
+            is the position of the source in ``sources``
+        """
+        reader = sources if isinstance(sources, MultiSourceReader) else MultiSourceReader(sources, buffer_size)
+        batch_size = batch_size or len(reader.sources)
+        reader.start()
+        try:
+            while True:
+                batch = reader.next_batch(batch_size, timeout=1.0)
+                if not batch:
+                    if reader.finished:
+                        return
+                    continue
+                results = self._predict([frame for *_, frame in batch])
+                for (stream_id, index, timestamp, frame), result in zip(batch, results):
+                    if self.metrics:
+                        self._record_speed(result)
+                    detections = self._to_detections(result, source=reader.names[stream_id])
+                    yield stream_id, index, timestamp, detections, frame
+        finally:
+            reader.stop()
+
+    def detect_streams(self, sources, output_dir=None, show=True, batch_size=None, buffer_size=4):
+        """
+        Detect runes in several cameras and video files with one shared model
+
+        Args:
+            sources: Camera ids (int) and/or video file paths
+            output_dir: Directory for one annotated video and one JSON Lines
+                detections file per stream (optional)
+            show: Display one window per stream
+            batch_size: Frames per model call (default: number of sources)
+            buffer_size: Frames buffered per source; cameras drop their oldest
+                frame when it is full
+
+        Returns:
+            List of per-stream stats dicts (name, frames, fps, dropped)
+        """
+        import cv2
+
+        reader = MultiSourceReader(sources, buffer_size)
+        print(f"\nProcessing {len(reader.sources)} streams: {', '.join(reader.names)}")
+        print("Press 'q' to quit" if show else "Press Ctrl+C to quit")
+
+        for name, cap in zip(reader.names, reader.caps):
+            if not cap.isOpened():
+                print(f"Error: Could not open stream: {name}")
+                reader.stop()
+                return []
+
+        count = len(reader.sources)
+        writers = [None] * count
+        result_files = [None] * count
+        if output_dir:
+            Path(output_dir).mkdir(parents=True, exist_ok=True)
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            for i, (name, cap) in enumerate(zip(reader.names, reader.caps)):
+                size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+                fps = cap.get(cv2.CAP_PROP_FPS) or 30
+                writers[i] = cv2.VideoWriter(str(Path(output_dir) / f'{i}_{name}.mp4'), fourcc, fps, size)
+                result_files[i] = open(Path(output_dir) / f'{i}_{name}.jsonl', 'w', encoding='utf-8')
+
+        frame_counts = [0] * count
+        last_seen = [None] * count
         start_time = time.time()
+        frames = self.stream_multi(reader, batch_size=batch_size)
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                print("Error: Could not read frame")
-                break
+        try:
+            for stream_id, index, timestamp, detections, frame in frames:
+                frame_counts[stream_id] += 1
+                last_seen[stream_id] = time.time()
+                elapsed = last_seen[stream_id] - start_time
+                stream_fps = frame_counts[stream_id] / elapsed if elapsed > 0 else 0
 
-            frame_count += 1
+                if result_files[stream_id]:
+                    record = {'frame': index, 'timestamp': round(timestamp, 3), 'detections': detections.to_list()}
+                    result_files[stream_id].write(json.dumps(record, ensure_ascii=False) + '\n')
 
-            # Run detection
-            results = self.model.predict(
-                source=frame,
-                conf=self.conf_threshold,
-                iou=self.iou_threshold,
-                save=False,
-                verbose=False
-            )
+                if show or writers[stream_id]:
+                    with self._stage('annotation'):
+                        draw_detections(frame, detections)
+                        cv2.putText(frame, f'{reader.names[stream_id]} FPS: {stream_fps:.1f}',
+                                   (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
 
-            # Get annotated frame
-            annotated_frame = results[0].plot()
+                if writers[stream_id]:
+                    with self._stage('encode'):
+                        writers[stream_id].write(frame)
 
-            # Add FPS counter
-            elapsed = time.time() - start_time
-            current_fps = frame_count / elapsed if elapsed > 0 else 0
-            cv2.putText(annotated_frame, f'FPS: {current_fps:.1f}',
-                       (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+                if show:
+                    with self._stage('display'):
+                        cv2.imshow(f'Rune Detection - {reader.names[stream_id]}', frame)
+                        key = cv2.waitKey(1) & 0xFF
+                    if key == ord('q'):
+                        print("\nStopped by user")
+                        break
 
-            # Add detection count
-            num_detections = len(results[0].boxes)
-            cv2.putText(annotated_frame, f'Runes: {num_detections}',
-                       (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+                # Progress
+                if sum(frame_counts) % 100 == 0:
+                    rates = [c / (t - start_time) if t and t > start_time else 0 for c, t in zip(frame_counts, last_seen)]
+                    print("Processed " + ', '.join(f'{n}: {c} ({r:.1f} FPS)'
+                                                   for n, c, r in zip(reader.names, frame_counts, rates)))
+        except KeyboardInterrupt:
+            print("\nStopped by user")
+        finally:
+            frames.close()
+            for writer in writers:
+                if writer:
+                    writer.release()
+            for f in result_files:
+                if f:
+                    f.close()
+            if show:
+                cv2.destroyAllWindows()
 
-            # Display
-            cv2.imshow('Rune Detection - Webcam', annotated_frame)
+        stats = []
+        for i, name in enumerate(reader.names):
+            elapsed = (last_seen[i] - start_time) if last_seen[i] else 0
+            stats.append({
+                'name': name,
+                'frames': frame_counts[i],
+                'fps': round(frame_counts[i] / elapsed, 2) if elapsed > 0 else 0.0,
+                'dropped': reader.dropped[i]
+            })
 
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                print("\nStopped by user")
-                break
+        print("\n" + "="*60)
+        print(f"{'stream':<24}{'frames':>10}{'fps':>10}{'dropped':>10}")
+        print("="*60)
+        for stat in stats:
+            print(f"{stat['name']:<24}{stat['frames']:>10}{stat['fps']:>10.1f}{stat['dropped']:>10}")
+        print("="*60)
+        total_elapsed = time.time() - start_time
+        print(f"Total: {sum(frame_counts)} frames ({sum(frame_counts) / total_elapsed if total_elapsed > 0 else 0:.1f} FPS), "
+              f"fairness (Jain's index over stream FPS): {jain_fairness([s['fps'] for s in stats]):.3f}")
+        if output_dir:
+            print(f"Saved per-stream videos and detections to: {output_dir}")
+
+        return stats
+
+    def detect_shared(self, source, live=False, output_path=None, show=True, slots=8, motion_threshold=None,
+                      motion_refresh=30, detect_every=None, adaptive_interval=False):
+        """
+        Detect runes with capture, inference and rendering in separate processes
+
+        A capture process decodes frames straight into the slots of a
+        SharedFrameRing, this process runs the model on those slots in place,
+        and a render process draws the boxes onto the same slots before
+        writing/displaying them. Only slot numbers and detection boxes cross
+        process boundaries; a slot is handed back to the capture process once
+        it has been rendered.
+
+        Args:
+            source: Video path, or camera id with ``live``
+            live: Camera source; frames arriving while every slot is busy are dropped
+            output_path: Path to save output video (optional)
+            show: Whether to display the result
+            slots: Frame slots in the ring; bounds how far capture can run ahead
+            motion_threshold: Skip inference and reuse the previous detections when
+                the mean downscaled pixel change is below this value (None: off)
+            motion_refresh: Force inference at least every N frames with motion gating
+            detect_every: Run the detector every N frames and move boxes with
+                optical flow in between (None: detect every frame)
+            adaptive_interval: Let the tracker grow or shrink N with tracking quality
+
+        Returns:
+            List of Detections, one per processed frame
+        """
+        import cv2
+        from rune_shm import SharedFrameRing, capture_worker, render_worker
 
+        cap = cv2.VideoCapture(source)
+        if not cap.isOpened():
+            print(f"Error: Could not open {'camera' if live else 'video'} {source}")
+            return []
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = int(cap.get(cv2.CAP_PROP_FPS)) or 30
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         cap.release()
-        cv2.destroyAllWindows()
 
+        print(f"\nProcessing {'camera' if live else 'video'} {source} in separate processes "
+              f"({slots} shared frame slots of {width}x{height})")
+        if show:
+            print("Press 'q' in the window to quit")
+
+        ring = SharedFrameRing((height, width, 3), slots)
+        context = multiprocessing.get_context('spawn')
+        free_slots = context.Semaphore(slots)
+        filled = context.Queue()
+        done = context.Queue()
+        stop = context.Event()
+        dropped = context.Value('i', 0)
 
-def main():
-    parser = argparse.ArgumentParser(description='YOLO12 Rune Detection')
-    parser.add_argument('--source', type=str, help='Path to image or video file, or "webcam" for camera')
-    parser.add_argument('--model', type=str, default='models/best.pt', help='Path to YOLO12 model (default: models/best.pt)')
-    parser.add_argument('--conf', type=float, default=0.25, help='Confidence threshold (default: 0.25)')
-    parser.add_argument('--iou', type=float, default=0.45, help='IoU threshold (default: 0.45)')
-    parser.add_argument('--output', type=str, help='Output path for result')
-    parser.add_argument('--no-show', action='store_true', help='Do not display results')
-    parser.add_argument('--camera-id', type=int, default=0, help='Camera device ID (default: 0)')
+        capture = context.Process(target=capture_worker, daemon=True,
+                                  args=(ring.spec, source, live, free_slots, filled, stop, dropped))
+        renderer = None
+        if show or output_path:
+            window = 'Rune Detection - Webcam' if live else 'Rune Detection'
+            renderer = context.Process(target=render_worker, daemon=True,
+                                       args=(ring.spec, self.model.names, done, free_slots, stop),
+                                       kwargs={'output_path': output_path, 'fps': fps, 'show': show, 'window': window})
+            renderer.start()
+        capture.start()
 
-    args = parser.parse_args()
+        gate = MotionGate(motion_threshold, motion_refresh) if motion_threshold is not None else None
+        tracker = FlowTracker(detect_every, adaptive=adaptive_interval) if detect_every else None
+        frames = _iter_ring(ring, filled, capture, renderer)
+        predictions = self._iter_sequential(frames, gate, tracker)
 
-    # Initialize detector
-    detector = RuneDetector(
-        model_path=args.model,
-        conf_threshold=args.conf,
-        iou_threshold=args.iou
-    )
+        frame_detections = []
+        start_time = time.time()
+        previous = None
+        try:
+            for index, _, _, slot, result in predictions:
+                if self.metrics and result is not previous:
+                    self._record_speed(result)
+                previous = result
+                detections = self._to_detections(result, source=index)
+                frame_detections.append(detections)
 
-    # Process based on source type
-    if not args.source:
-        print("Error: --source is required")
-        print("Examples:")
-        print("  python detect_rune.py --source image.jpg")
-        print("  python detect_rune.py --source video.mp4 --output output.mp4")
-        print("  python detect_rune.py --source webcam")
-        return
+                if renderer:
+                    done.put((slot, detections.xyxy, detections.conf, detections.class_ids))
+                else:
+                    free_slots.release()
 
-    if args.source.lower() == 'webcam':
-        detector.detect_webcam(camera_id=args.camera_id)
-    else:
-        source_path = Path(args.source)
-        if not source_path.exists():
-            print(f"Error: Source file not found: {args.source}")
-            return
+                if len(frame_detections) % 30 == 0:
+                    progress = f"/{total_frames}" if total_frames > 0 and not live else ""
+                    print(f"Processed {len(frame_detections)}{progress} frames")
+        except KeyboardInterrupt:
+            print("\nStopped by user")
+        finally:
+            stop.set()
+            predictions.close()
+            frames.close()
+            if renderer:
+                done.put(None)
+                renderer.join()
+            capture.join(timeout=5)
+            # Release views into the ring before freeing it
+            predictions = frames = result = previous = None
+            ring.close()
+        # A failing renderer also stops capture, which can end the frames before it is noticed
+        _check_renderer(renderer)
 
-        # Determine if image or video
-        image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
-        video_extensions = {'.mp4', '.avi', '.mov', '.mkv', '.flv'}
+        elapsed = time.time() - start_time
+        print(f"\nProcessed {len(frame_detections)} frames "
+              f"({len(frame_detections) / elapsed if elapsed > 0 else 0:.1f} FPS)")
+        if live:
+            print(f"Dropped {dropped.value} frame(s) while all {slots} slots were busy")
+        if gate:
+            gate.report()
+        if tracker:
+            tracker.report()
+        if output_path:
+            print(f"Saved result to: {output_path}")
 
-        ext = source_path.suffix.lower()
+        return frame_detections
 
-        if ext in image_extensions:
-            detector.detect_image(
-                str(source_path),
-                output_path=args.output,
-                show=not args.no_show
-            )
-        elif ext in video_extensions:
-            detector.detect_video(
-                str(source_path),
-                output_path=args.output,
-                show=not args.no_show
-            )
-        else:
-            print(f"Error: Unsupported file format: {ext}")
-            print(f"Supported image formats: {', '.join(image_extensions)}")
-            print(f"Supported video formats: {', '.join(video_extensions)}")
+    def detect_webcam(self, camera_id=0, low_latency=False, motion_threshold=None, motion_refresh=30, show=True,
+                      detect_every=None, adaptive_interval=False, shared_memory=False, ring_slots=8):
+        """
+        Detect runes in real-time from webcam
+
+        Args:
+            camera_id: Camera device ID (default: 0)
+            low_latency: Capture on a background thread and always process the
+                newest frame, dropping frames that arrive while the model runs
+            motion_threshold: Skip inference and reuse the previous detections when
+                the mean downscaled pixel change is below this value (None: off)
+            motion_refresh: Force inference at least every N frames with motion gating
+            show: Display annotated frames; when False, run detections only
+                without any drawing (stop with Ctrl+C)
+            detect_every: Run the detector every N frames and move boxes with
+                optical flow in between (None: detect every frame)
+            adaptive_interval: Let the tracker grow or shrink N with tracking quality
+            shared_memory: Capture, detect and render in separate processes that
+                share frames through a SharedFrameRing; frames arriving while every
+                slot is busy are dropped (low_latency unused)
+            ring_slots: Frame slots in the shared ring (shared_memory only)
+
+        Returns:
+            List of Detections, one per processed frame
+        """
+        import cv2
+        import numpy as np
+
+        if shared_memory:
+            return self.detect_shared(camera_id, live=True, show=show, slots=ring_slots,
+                                      motion_threshold=motion_threshold, motion_refresh=motion_refresh,
+                                      detect_every=detect_every, adaptive_interval=adaptive_interval)
+
+        print(f"\nStarting webcam detection (camera {camera_id})")
+        print("Press 'q' to quit" if show else "Press Ctrl+C to quit")
+
+        cap = cv2.VideoCapture(camera_id)
+
+        if not cap.isOpened():
+            print(f"Error: Could not open camera {camera_id}")
+            return []
+
+        reader = LatestFrameReader(cap).start() if low_latency else None
+        gate = MotionGate(motion_threshold, motion_refresh) if motion_threshold is not None else None
+        tracker = FlowTracker(detect_every, adaptive=adaptive_interval) if detect_every else None
+        frame_detections = []
+        latencies = deque(maxlen=1000)
+
+        latency_ms = None
+
+        def record_latency(captured_at):
+            # Measured once the frame is on screen, or after detection when headless
+            nonlocal latency_ms
+            latency_ms = (time.time() - captured_at) * 1000
+            latencies.append(latency_ms)
+            if frame_count % 30 == 0:
+                print(f"Frame {frame_count}: latency {latency_ms:.1f} ms, "
+                      f"dropped {reader.dropped} stale frame(s)")
+
+        frame_count = 0
+        start_time = time.time()
+        frames = self.stream(reader or cap, motion_gate=gate, tracker=tracker, with_frames=True)
+
+        try:
+            for _, captured_at, detections, frame in frames:
+                frame_count += 1
+                frame_detections.append(detections)
+
+                if not show:
+                    if reader:
+                        record_latency(captured_at)
+                    continue
+
+                with self._stage('annotation'):
+                    # Draw in place on the captured frame (detections may be reused from an earlier frame)
+                    draw_detections(frame, detections)
+
+                    # Add FPS counter
+                    elapsed = time.time() - start_time
+                    current_fps = frame_count / elapsed if elapsed > 0 else 0
+                    cv2.putText(frame, f'FPS: {current_fps:.1f}',
+                               (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+
+                    # Add detection count
+                    cv2.putText(frame, f'Runes: {len(detections)}',
+                               (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+
+                    # Add capture-to-display latency of the previously shown frame
+                    if latency_ms is not None:
+                        cv2.putText(frame, f'Latency: {latency_ms:.0f} ms',
+                                   (10, 110), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+
+                # Display
+                with self._stage('display'):
+                    cv2.imshow('Rune Detection - Webcam', frame)
+                    key = cv2.waitKey(1) & 0xFF
+
+                if reader:
+                    record_latency(captured_at)
+
+                if key == ord('q'):
+                    print("\nStopped by user")
+                    break
+            else:
+                print("Error: Could not read frame")
+        except KeyboardInterrupt:
+            print("\nStopped by user")
+
+        frames.close()
+        if reader:
+            reader.stop()
+        cap.release()
+        if show:
+            cv2.destroyAllWindows()
+
+        if latencies:
+            print(f"\nCapture-to-{'display' if show else 'detection'} latency over last {len(latencies)} frames: "
+                  f"median {np.percentile(latencies, 50):.1f} ms, "
+                  f"p95 {np.percentile(latencies, 95):.1f} ms")
+            print(f"Dropped {reader.dropped} stale frame(s), processed {frame_count}")
+        if gate:
+            gate.report()
+        if tracker:
+            tracker.report()
+
+        return frame_detections
+
+
+# BGR colors cycled by class id
+CLASS_COLORS = [
+    (56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255), (49, 210, 207),
+    (10, 249, 72), (23, 204, 146), (134, 219, 61), (52, 147, 26), (187, 212, 0),
+    (168, 153, 44), (255, 194, 0), (147, 69, 52), (255, 115, 100), (236, 24, 0),
+    (255, 56, 132), (133, 0, 82), (255, 56, 203), (200, 149, 255), (199, 55, 255)
+]
+
+
+def draw_detections(frame, detections, line_width=2):
+    """
+    Draw boxes and labels onto a frame in place
+
+    Unlike ultralytics' Results.plot(), this does not copy the frame, so
+    the decoded frame itself becomes the annotated output.
+
+    Args:
+        frame: BGR frame to draw on (modified in place)
+        detections: Detections for the frame
+        line_width: Box line width in pixels
+
+    Returns:
+        The same frame, for convenience
+    """
+    import cv2
+    import numpy as np
+
+    boxes = detections.xyxy.astype(np.int32).tolist()
+    for (x1, y1, x2, y2), cls, conf in zip(boxes, detections.class_ids.tolist(), detections.conf.tolist()):
+        color = CLASS_COLORS[cls % len(CLASS_COLORS)]
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, line_width)
+        cv2.putText(frame, f'{detections.names[cls]} {conf:.2f}', (x1, max(y1 - 6, 12)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1, cv2.LINE_AA)
+    return frame
+
+
+class MotionGate:
+    """
+    Decide whether a frame changed enough to be worth running the model on
+
+    Each frame is reduced to a small grayscale thumbnail and compared with
+    the thumbnail of the last frame that was actually inferred. Comparing
+    against that reference rather than the previous frame means slow drift
+    still triggers inference once it adds up.
+    """
+
+    def __init__(self, threshold=2.0, refresh_interval=30, size=(64, 36)):
+        """
+        Args:
+            threshold: Mean absolute thumbnail difference (0-255) below which a
+                frame counts as unchanged
+            refresh_interval: Force inference after this many skipped frames
+            size: Thumbnail (width, height)
+        """
+        self.threshold = threshold
+        self.refresh_interval = refresh_interval
+        self.size = size
+        self.inferred = 0
+        self.skipped = 0
+        self._reference = None
+        self._since_inference = 0
+
+    def should_infer(self, frame):
+        """Return True if the frame needs a fresh inference"""
+        import cv2
+
+        thumb = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), self.size, interpolation=cv2.INTER_AREA)
+
+        if (self._reference is not None and self._since_inference < self.refresh_interval
+                and cv2.absdiff(thumb, self._reference).mean() < self.threshold):
+            self.skipped += 1
+            self._since_inference += 1
+            return False
+
+        self._reference = thumb
+        self._since_inference = 0
+        self.inferred += 1
+        return True
+
+    def report(self):
+        total = self.inferred + self.skipped
+        if total:
+            print(f"Motion gate: skipped {self.skipped}/{total} inferences ({self.skipped / total * 100:.1f}%)")
+
+
+class FlowTracker:
+    """
+    Move detection boxes between detector runs with Lucas-Kanade sparse optical flow
+
+    After each detection, corner features are picked inside every box and
+    followed from frame to frame; a box moves by the median displacement of
+    its features. Features failing a forward-backward consistency check are
+    dropped, and when a box keeps too few of them the tracker asks for a
+    fresh detection before the interval is up. With ``adaptive`` the
+    interval grows by one after every interval that tracked cleanly and
+    halves whenever a track is lost.
+    """
+
+    def __init__(self, interval=5, adaptive=False, max_interval=None, min_survival=0.5, max_fb_error=1.0):
+        """
+        Args:
+            interval: Run the detector every N frames
+            adaptive: Adjust the interval to how well tracking holds
+            max_interval: Upper bound for the adaptive interval (default: 4 x interval)
+            min_survival: Re-detect once a box keeps less than this fraction of its features
+            max_fb_error: Forward-backward flow error in pixels above which a feature is dropped
+        """
+        self.interval = interval
+        self.adaptive = adaptive
+        self.max_interval = max_interval or interval * 4
+        self.min_survival = min_survival
+        self.max_fb_error = max_fb_error
+        self.detected = 0
+        self.tracked = 0
+        self.lost = 0
+        self._gray = None
+        self._boxes = None
+        self._points = None
+        self._owners = None
+        self._initial = None
+        self._since_detection = 0
+
+    def due(self):
+        """True when the next frame should go to the detector"""
+        return self._boxes is None or self._since_detection >= self.interval
+
+    def reset(self, frame, data):
+        """
+        Start tracking fresh detections
+
+        Args:
+            frame: BGR frame the detections belong to
+            data: (N, 6) array of x1, y1, x2, y2, confidence, class id
+        """
+        import cv2
+        import numpy as np
+
+        if self.adaptive and self._boxes is not None and self._since_detection >= self.interval:
+            self.interval = min(self.max_interval, self.interval + 1)
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        height, width = gray.shape
+        points, owners = [], []
+        self._initial = np.zeros(len(data), dtype=np.int32)
+        for i, (x1, y1, x2, y2) in enumerate(data[:, :4].astype(np.int32).tolist()):
+            x1, y1, x2, y2 = max(x1, 0), max(y1, 0), min(x2, width), min(y2, height)
+            if x2 - x1 < 3 or y2 - y1 < 3:
+                continue
+            corners = cv2.goodFeaturesToTrack(gray[y1:y2, x1:x2], maxCorners=20, qualityLevel=0.01, minDistance=2)
+            if corners is None or len(corners) < 4:
+                # Low-texture box: follow a coarse grid instead
+                xs, ys = np.meshgrid(np.linspace(0, x2 - x1 - 1, 3), np.linspace(0, y2 - y1 - 1, 3))
+                corners = np.stack([xs.ravel(), ys.ravel()], axis=1)
+            corners = corners.reshape(-1, 1, 2).astype(np.float32) + np.float32([x1, y1])
+            points.append(corners)
+            owners.append(np.full(len(corners), i))
+            self._initial[i] = len(corners)
+
+        self._gray = gray
+        self._boxes = data.astype(np.float32).copy()
+        self._points = np.concatenate(points) if points else np.zeros((0, 1, 2), dtype=np.float32)
+        self._owners = np.concatenate(owners) if owners else np.zeros(0, dtype=np.int64)
+        self._since_detection = 0
+        self.detected += 1
+
+    def track(self, frame):
+        """
+        Move the boxes onto a new frame
+
+        Returns:
+            (N, 6) array like the one given to reset(), or None when a track
+            was lost and the frame should go to the detector
+        """
+        import cv2
+        import numpy as np
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        self._since_detection += 1
+        if not len(self._points):
+            self._gray = gray
+            self.tracked += 1
+            return self._boxes.copy()
+
+        flow_args = dict(winSize=(15, 15), maxLevel=2)
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(self._gray, gray, self._points, None, **flow_args)
+        back, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self._gray, moved, None, **flow_args)
+        fb_error = np.linalg.norm((back - self._points).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (back_status.ravel() == 1) & (fb_error < self.max_fb_error)
+
+        shifts = (moved - self._points).reshape(-1, 2)
+        boxes = self._boxes.copy()
+        for i in range(len(boxes)):
+            if not self._initial[i]:
+                continue
+            kept = good & (self._owners == i)
+            if kept.sum() < max(2, self.min_survival * self._initial[i]):
+                self.lost += 1
+                if self.adaptive:
+                    self.interval = max(1, self.interval // 2)
+                return None
+            dx, dy = np.median(shifts[kept], axis=0)
+            boxes[i, [0, 2]] += dx
+            boxes[i, [1, 3]] += dy
+
+        height, width = gray.shape
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+
+        self._gray = gray
+        self._boxes = boxes
+        self._points = moved[good]
+        self._owners = self._owners[good]
+        self.tracked += 1
+        return boxes.copy()
+
+    def report(self):
+        total = self.detected + self.tracked
+        if total:
+            print(f"Tracker: detector ran on {self.detected}/{total} frames ({self.detected / total * 100:.1f}%), "
+                  f"{self.lost} early re-detection(s) after lost tracks, final interval {self.interval}")
+
+
+class ClipRecorder:
+    """
+    Write short clips around detections instead of re-encoding the whole video
+
+    The most recent ``pre_roll`` seconds of frames wait in a ring buffer.
+    When a frame has detections, a clip starts with the buffered frames and
+    stays open until ``post_roll`` seconds pass without detections, so
+    nearby appearances merge into one clip. Frames outside any clip are
+    never encoded.
+
+    Every frame with detections is also appended to a compact JSON Lines
+    sidecar: a header line with the video properties and class names, then
+    one ``{"frame", "t", "clip", "boxes"}`` line per frame, where each box
+    is ``[x1, y1, x2, y2, confidence, class_id]``.
+    """
+
+    def __init__(self, output_dir, video_name, fps, size, names, pre_roll=2.0, post_roll=2.0):
+        """
+        Args:
+            output_dir: Directory for clips and the sidecar file
+            video_name: Base name used for clip and sidecar file names
+            fps: Frame rate of the clips
+            size: Frame (width, height)
+            names: Mapping from class id to class name
+            pre_roll: Seconds of video kept before the first detection of a clip
+            post_roll: Seconds of video kept after the last detection of a clip
+        """
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.video_name = video_name
+        self.fps = fps
+        self.size = size
+        self.post_roll_frames = max(1, round(post_roll * fps))
+        self.ring = deque(maxlen=max(1, round(pre_roll * fps)))
+        self.clips = []
+        self.frames_written = 0
+        self._writer = None
+        self._remaining = 0
+
+        self.sidecar_path = self.output_dir / f'{video_name}.detections.jsonl'
+        self._sidecar = open(self.sidecar_path, 'w', encoding='utf-8')
+        header = {'video': video_name, 'fps': fps, 'size': list(size), 'names': {int(k): v for k, v in names.items()}}
+        self._sidecar.write(json.dumps(header, ensure_ascii=False) + '\n')
+
+    def add(self, index, timestamp, frame, detections):
+        """Feed the next frame in order, with its detections"""
+        import cv2
+        import numpy as np
+
+        if len(detections):
+            if self._writer is None:
+                path = self.output_dir / f'{self.video_name}_clip{len(self.clips) + 1:03d}.mp4'
+                self._writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), self.fps, self.size)
+                start_index, start_time = (self.ring[0][0], self.ring[0][1]) if self.ring else (index, timestamp)
+                self.clips.append({'path': str(path), 'start_frame': start_index, 'start_time': round(start_time, 3)})
+                for _, _, buffered in self.ring:
+                    self._writer.write(buffered)
+                self.frames_written += len(self.ring)
+                self.ring.clear()
+            self._remaining = self.post_roll_frames
+
+            boxes = np.column_stack([detections.xyxy.astype(np.float64).round(1),
+                                     detections.conf.astype(np.float64).round(3), detections.class_ids])
+            record = {'frame': index, 't': round(timestamp, 3), 'clip': Path(self.clips[-1]['path']).name,
+                      'boxes': [[*box[:5], int(box[5])] for box in boxes.tolist()]}
+            self._sidecar.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+        if self._writer is None:
+            self.ring.append((index, timestamp, frame))
+            return
+
+        self._writer.write(frame)
+        self.frames_written += 1
+        self.clips[-1].update(end_frame=index, end_time=round(timestamp, 3))
+        if not len(detections):
+            self._remaining -= 1
+            if self._remaining <= 0:
+                self._close_clip()
+
+    def _close_clip(self):
+        self._writer.release()
+        self._writer = None
+
+    def close(self):
+        """Finish the open clip and the sidecar file"""
+        if self._writer is not None:
+            self._close_clip()
+        self._sidecar.close()
+
+    def report(self, total_frames):
+        print(f"Saved {len(self.clips)} clip(s) to: {self.output_dir} "
+              f"({self.frames_written}/{total_frames} frames encoded)")
+        for clip in self.clips:
+            print(f"  {Path(clip['path']).name}: frames {clip['start_frame']}-{clip.get('end_frame', clip['start_frame'])} "
+                  f"({clip['start_time']:.1f}s - {clip.get('end_time', clip['start_time']):.1f}s)")
+        print(f"Saved detections to: {self.sidecar_path}")
+
+
+class LatestFrameReader:
+    """
+    Read frames from a VideoCapture on a background thread, keeping only the newest
+
+    When inference is slower than the camera, reading on demand returns frames
+    that have waited in the driver buffer. This reader drains the camera
+    continuously and hands out the most recent frame, counting the ones that
+    were replaced before anybody read them.
+    """
+
+    def __init__(self, cap):
+        """
+        Args:
+            cap: Opened cv2.VideoCapture
+        """
+        import cv2
+
+        self.cap = cap
+        self.dropped = 0
+        self._cond = threading.Condition()
+        self._frame = None
+        self._captured_at = None
+        self._seq = 0
+        self._read_seq = 0
+        self._ended = False
+        self._running = False
+        self._thread = None
+
+        # Keep the driver-side queue as short as the backend allows
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+    def start(self):
+        """Start the capture thread"""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='rune-capture', daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while self._running:
+            ret, frame = self.cap.read()
+            captured_at = time.time()
+            with self._cond:
+                if not ret:
+                    self._ended = True
+                    self._cond.notify_all()
+                    return
+                if self._seq > self._read_seq:
+                    self.dropped += 1
+                self._frame = frame
+                self._captured_at = captured_at
+                self._seq += 1
+                self._cond.notify_all()
+
+    def read(self, timeout=None):
+        """
+        Wait for a frame newer than the last one returned
+
+        Returns:
+            (ok, frame, captured_at) where captured_at is a time.time() value
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > self._read_seq or self._ended, timeout)
+            if self._seq == self._read_seq:
+                return False, None, None
+            self._read_seq = self._seq
+            return True, self._frame, self._captured_at
+
+    def stop(self):
+        """Stop the capture thread"""
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=2.0)
+
+
+class MultiSourceReader:
+    """
+    Capture several cameras and video files on their own threads for one shared model
+
+    Each source has a small buffer. Camera buffers drop their oldest frame
+    when full (counted in ``dropped``), so a busy model never falls behind
+    live input; video file readers wait instead, so every file frame is
+    processed. ``next_batch`` takes frames round-robin, at most one per
+    stream per pass, so no source can starve the others.
+    """
+
+    def __init__(self, sources, buffer_size=4):
+        """
+        Args:
+            sources: Camera ids (int) and/or video file paths
+            buffer_size: Frames buffered per source
+        """
+        import cv2
+
+        self.sources = list(sources)
+        self.names = [f'camera{s}' if isinstance(s, int) else Path(s).stem for s in self.sources]
+        self.live = [isinstance(s, int) for s in self.sources]
+        self.caps = [cv2.VideoCapture(s if isinstance(s, int) else str(s)) for s in self.sources]
+        self.buffer_size = buffer_size
+        self.buffers = [deque() for _ in self.sources]
+        self.dropped = [0] * len(self.sources)
+        self.ended = [False] * len(self.sources)
+        self._cond = threading.Condition()
+        self._next = 0
+        self._running = False
+        self._threads = []
+
+    def start(self):
+        """Start one capture thread per source"""
+        self._running = True
+        for i in range(len(self.sources)):
+            thread = threading.Thread(target=self._run, args=(i,), name=f'rune-capture-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def _run(self, i):
+        buffer = self.buffers[i]
+        try:
+            for index, timestamp, frame, _ in _iter_capture(self.caps[i], self.live[i]):
+                with self._cond:
+                    if self.live[i]:
+                        if len(buffer) >= self.buffer_size:
+                            buffer.popleft()
+                            self.dropped[i] += 1
+                    else:
+                        self._cond.wait_for(lambda: len(buffer) < self.buffer_size or not self._running)
+                    if not self._running:
+                        return
+                    buffer.append((index, timestamp, frame))
+                    self._cond.notify_all()
+        finally:
+            with self._cond:
+                self.ended[i] = True
+                self._cond.notify_all()
+
+    @property
+    def finished(self):
+        """True once every source has ended and all buffered frames were taken"""
+        with self._cond:
+            return all(self.ended) and not any(self.buffers)
+
+    def next_batch(self, max_size, timeout=None):
+        """
+        Wait for frames and take up to ``max_size`` of them round-robin
+
+        Returns:
+            List of (stream_id, frame_index, timestamp, frame); empty on timeout
+            or once every source has ended
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: any(self.buffers) or all(self.ended), timeout)
+            batch = []
+            count = len(self.buffers)
+            while len(batch) < max_size and any(self.buffers):
+                for offset in range(count):
+                    i = (self._next + offset) % count
+                    if self.buffers[i] and len(batch) < max_size:
+                        batch.append((i, *self.buffers[i].popleft()))
+                # The next batch starts after the last stream served
+                self._next = (batch[-1][0] + 1) % count
+            self._cond.notify_all()
+            return batch
+
+    def stop(self):
+        """Stop the capture threads and release every source"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+        for cap in self.caps:
+            cap.release()
+
+
+def jain_fairness(values):
+    """Jain's fairness index: 1.0 when all values are equal, 1/n when one takes everything"""
+    total = sum(values)
+    squares = sum(v * v for v in values)
+    return total * total / (len(values) * squares) if squares else 1.0
+
+
+def detect_backend(model_path):
+    """
+    Infer the backend from an already exported model path
+
+    Returns:
+        'onnx', 'openvino', or None for PyTorch weights
+    """
+    path = str(model_path).rstrip('/\\')
+    if path.endswith('.onnx'):
+        return 'onnx'
+    if path.endswith('_openvino_model'):
+        return 'openvino'
+    return None
+
+
+def detection_settings(model_path, backend='torch', conf=0.25, iou=0.45, imgsz=640, tile_size=None,
+                       tile_overlap=0.2, tile_full_frame=True, tile_merge='nms', cascade_model=None,
+                       cascade_band=(0.1, 0.5), cascade_crops=False):
+    """
+    JSON-serializable dict of the options that change detection results
+
+    Used to check that a running detection server was started with the same
+    options as a client invocation. Paths are resolved and options that have
+    no effect (tile options without tiling, cascade options without a
+    secondary model) are left out, so equivalent setups compare equal.
+    """
+    settings = {
+        'model': str(Path(model_path).resolve()),
+        'backend': detect_backend(model_path) or backend,
+        'conf': conf,
+        'iou': iou,
+        'imgsz': imgsz,
+        'tile': None,
+        'cascade': None
+    }
+    if tile_size:
+        settings['tile'] = [tile_size, tile_overlap, tile_full_frame, tile_merge]
+    if cascade_model:
+        settings['cascade'] = [str(Path(cascade_model).resolve()), list(cascade_band), cascade_crops]
+    return settings
+
+
+def file_hash(path, length=12):
+    """Return a short SHA-256 hex digest of a file's contents (or of every file in a directory)"""
+    path = Path(path)
+    files = sorted(p for p in path.rglob('*') if p.is_file()) if path.is_dir() else [path]
+    digest = hashlib.sha256()
+    for file in files:
+        with open(file, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()[:length]
+
+
+def export_cached(weights_path, backend, imgsz=640):
+    """
+    Export PyTorch weights to an ONNX/OpenVINO artifact, reusing a cached export
+
+    The artifact is stored next to the weights and named after the weights
+    hash and image size (e.g. ``best.3f2a9c1d7e4b.640.onnx``), so retrained
+    weights or a different imgsz produce a new export while repeated runs
+    load the cached one directly.
+
+    Args:
+        weights_path: Path to .pt weights
+        backend: 'onnx' or 'openvino'
+        imgsz: Export image size
+
+    Returns:
+        Path to the exported artifact
+    """
+    weights_path = Path(weights_path)
+    key = f"{weights_path.stem}.{file_hash(weights_path)}.{imgsz}"
+    if backend == 'onnx':
+        cached = weights_path.with_name(f"{key}.onnx")
+    else:
+        cached = weights_path.with_name(f"{key}_openvino_model")
+
+    if cached.exists():
+        print(f"Using cached {backend} export: {cached}")
+        return str(cached)
+
+    from ultralytics import YOLO
+
+    print(f"Exporting {weights_path} to {backend} (imgsz={imgsz}), this only happens once...")
+    # Export a private copy of the weights: ultralytics writes next to its input, which would
+    # overwrite a user's own best.onnx / best_openvino_model and collide with concurrent exports
+    with tempfile.TemporaryDirectory(prefix='.rune_export_', dir=weights_path.parent) as tmp_dir:
+        tmp_weights = Path(tmp_dir) / weights_path.name
+        shutil.copy2(weights_path, tmp_weights)
+        # Dynamic axes keep batched inference (detect_batch) working on the export
+        exported = YOLO(str(tmp_weights)).export(format=backend, imgsz=imgsz, dynamic=True)
+        try:
+            os.replace(exported, cached)
+        except OSError:
+            # Another process finished the same export first
+            if not cached.exists():
+                raise
+    print(f"Cached {backend} export: {cached}")
+    return str(cached)
+
+
+def physical_cores():
+    """Physical core count, falling back to logical cores without psutil"""
+    try:
+        import psutil
+        cores = psutil.cpu_count(logical=False)
+    except ImportError:
+        cores = None
+    return cores or os.cpu_count() or 1
+
+
+def default_shard_workers(threads_per_worker):
+    """Physical core count divided by the torch threads each worker uses"""
+    return max(1, physical_cores() // max(1, threads_per_worker))
+
+
+def shard_video(video_path, detector_config, output_path=None, results_path=None, workers=None, threads=None):
+    """
+    Detect runes in a long video by splitting it across worker processes
+
+    The video is split into contiguous frame ranges. Each worker process
+    loads its own model, seeks to its range with CAP_PROP_POS_FRAMES and
+    writes an annotated segment plus per-frame detections; the parent
+    then stitches both back together in frame order. The parent process
+    does not load a model.
+
+    Args:
+        video_path: Path to input video
+        detector_config: RuneDetector keyword arguments for the workers
+        output_path: Path to save the stitched output video (optional)
+        results_path: Path to the per-frame JSON Lines detections file
+        workers: Number of worker processes (default: physical cores // threads)
+        threads: Torch threads per worker (default: SHARD_THREADS)
+
+    Returns:
+        Path to the detections file
+    """
+    import cv2
+
+    # Few threads per worker: shards scale across processes better than one model across cores
+    threads = threads or SHARD_THREADS
+    workers = workers or default_shard_workers(threads)
+
+    cap = cv2.VideoCapture(video_path)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    if total_frames <= 0:
+        print(f"Error: Could not determine frame count of {video_path}")
+        return None
+
+    workers = max(1, min(workers, total_frames))
+    bounds = [total_frames * i // workers for i in range(workers + 1)]
+    results_path = results_path or str(Path(output_path or Path('output') / Path(video_path).name).with_suffix('.jsonl'))
+    Path(results_path).parent.mkdir(parents=True, exist_ok=True)
+
+    print(f"\nProcessing video: {video_path}")
+    print(f"Sharding {total_frames} frames across {workers} worker(s) x {threads} torch thread(s)")
+
+    # Export once here instead of racing to the same cache file from every worker
+    backend = detect_backend(detector_config['model_path']) or detector_config.get('backend', 'torch')
+    if backend != 'torch' and str(detector_config['model_path']).endswith('.pt'):
+        detector_config = {**detector_config,
+                           'model_path': export_cached(detector_config['model_path'], backend,
+                                                       detector_config.get('imgsz', 640))}
+
+    start_time = time.time()
+    with tempfile.TemporaryDirectory(prefix='rune_shards_', dir=Path(results_path).parent) as tmp_dir:
+        jobs = []
+        for i in range(workers):
+            # The last shard reads to EOF in case the container's frame count is short
+            end = bounds[i + 1] if i < workers - 1 else None
+            segment = str(Path(tmp_dir) / f'shard_{i:03d}.mp4') if output_path else None
+            jobs.append({
+                'index': i,
+                'video_path': video_path,
+                'start': bounds[i],
+                'end': end,
+                'segment_path': segment,
+                'results_path': str(Path(tmp_dir) / f'shard_{i:03d}.jsonl'),
+                'threads': threads,
+                'detector': detector_config
+            })
+
+        # spawn: forking a process that already initialized torch threads can deadlock
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(processes=workers) as pool:
+            for index, frames in pool.imap_unordered(_video_shard_worker, jobs):
+                print(f"Shard {index + 1}/{workers} done ({frames} frames)")
+
+        frame_count = 0
+        with open(results_path, 'w', encoding='utf-8') as out:
+            for job in jobs:
+                with open(job['results_path'], 'r', encoding='utf-8') as shard:
+                    for line in shard:
+                        out.write(line)
+                        frame_count += 1
+
+        if output_path:
+            _concat_segments([job['segment_path'] for job in jobs], output_path, fps, (width, height))
+
+    elapsed = time.time() - start_time
+    print(f"\nProcessed {frame_count} frames ({frame_count / elapsed if elapsed > 0 else 0:.1f} FPS)")
+    print(f"Saved detections to: {results_path}")
+    if output_path:
+        print(f"Saved result to: {output_path}")
+
+    return results_path
+
+
+def _video_shard_worker(job):
+    """
+    Process one frame range of a video in a worker process
+
+    Returns:
+        (shard index, number of frames processed)
+    """
+    import cv2
+    import numpy as np
+    import torch
+
+    detector = RuneDetector(**job['detector'])
+    # The first predict sets up ultralytics' predictor, which resets torch threads on CPU
+    detector._predict(np.zeros((detector.imgsz, detector.imgsz, 3), dtype=np.uint8))
+    torch.set_num_threads(job['threads'])
+
+    cap = cv2.VideoCapture(job['video_path'])
+    cap.set(cv2.CAP_PROP_POS_FRAMES, job['start'])
+
+    writer = None
+    if job['segment_path']:
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        writer = cv2.VideoWriter(job['segment_path'], fourcc, cap.get(cv2.CAP_PROP_FPS), (width, height))
+
+    frame_index = job['start']
+    with open(job['results_path'], 'w', encoding='utf-8') as out:
+        while job['end'] is None or frame_index < job['end']:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            detections = detector._to_detections(detector._predict(frame)[0])
+            record = {'frame': frame_index, 'detections': detections.to_list()}
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            if writer:
+                writer.write(draw_detections(frame, detections))
+            frame_index += 1
+
+    cap.release()
+    if writer:
+        writer.release()
+    return job['index'], frame_index - job['start']
+
+
+def _concat_segments(segment_paths, output_path, fps, size):
+    """
+    Join encoded video segments in order
+
+    Uses ffmpeg's concat demuxer (stream copy, no re-encode) when ffmpeg is
+    on PATH, and falls back to re-encoding the frames with OpenCV.
+    """
+    import cv2
+
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg:
+        list_path = Path(segment_paths[0]).with_name('segments.txt')
+        list_path.write_text(''.join(f"file '{Path(p).resolve()}'\n" for p in segment_paths), encoding='utf-8')
+        completed = subprocess.run(
+            [ffmpeg, '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0',
+             '-i', str(list_path), '-c', 'copy', output_path]
+        )
+        if completed.returncode == 0:
+            return
+
+        print("Warning: ffmpeg concat failed, re-encoding segments with OpenCV")
+
+    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    for segment in segment_paths:
+        cap = cv2.VideoCapture(segment)
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            writer.write(frame)
+        cap.release()
+    writer.release()
+
+
+def tile_origins(shape, tile_size, overlap):
+    """
+    Return the (x, y) top-left corners of overlapping tiles covering a frame
+
+    Tiles step by ``tile_size * (1 - overlap)``; the last tile on each axis is
+    aligned to the frame edge so nothing is cut off.
+    """
+    height, width = shape
+    step = max(1, int(tile_size * (1 - overlap)))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size + 1, step))
+        if positions[-1] != length - tile_size:
+            positions.append(length - tile_size)
+        return positions
+
+    return [(x, y) for y in starts(height) for x in starts(width)]
+
+
+def _box_iou(box, boxes):
+    """IoU of one xyxy box against an (N, 4) array of boxes"""
+    import numpy as np
+
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-9)
+
+
+def _add_speed(speed, extra):
+    """Add another model call's per-image preprocess/inference/postprocess ms to ``speed``"""
+    for stage, ms in (extra or {}).items():
+        if ms is not None:
+            speed[stage] = (speed.get(stage) or 0.0) + ms
+
+
+def nms(detections, iou_threshold):
+    """
+    Class-aware non-maximum suppression
+
+    Args:
+        detections: (N, 6) array of x1, y1, x2, y2, conf, class
+        iou_threshold: Boxes of the same class overlapping more than this are suppressed
+
+    Returns:
+        Indices of kept detections, highest confidence first
+    """
+    import numpy as np
+
+    order = np.argsort(-detections[:, 4])
+    keep = []
+    while len(order):
+        best = order[0]
+        keep.append(best)
+        rest = order[1:]
+        same_class = detections[rest, 5] == detections[best, 5]
+        overlap = _box_iou(detections[best, :4], detections[rest, :4]) > iou_threshold
+        order = rest[~(same_class & overlap)]
+    return np.array(keep, dtype=int)
+
+
+def weighted_boxes_fusion(detections, iou_threshold):
+    """
+    Merge overlapping same-class boxes into confidence-weighted averages
+
+    Args:
+        detections: (N, 6) array of x1, y1, x2, y2, conf, class
+        iou_threshold: Boxes of the same class overlapping more than this are fused
+
+    Returns:
+        (M, 6) array of fused detections, highest confidence first
+    """
+    import numpy as np
+
+    order = np.argsort(-detections[:, 4])
+    fused = []
+    while len(order):
+        best = order[0]
+        same_class = detections[order, 5] == detections[best, 5]
+        overlap = _box_iou(detections[best, :4], detections[order, :4]) > iou_threshold
+        cluster = detections[order[same_class & overlap]]
+        weights = cluster[:, 4:5]
+        box = (cluster[:, :4] * weights).sum(axis=0) / weights.sum()
+        fused.append([*box, cluster[:, 4].max(), detections[best, 5]])
+        order = order[~(same_class & overlap)]
+    return np.array(fused, dtype=np.float32).reshape(-1, 6)
+
+
+def _load_image(source):
+    """Return a BGR frame for a path or pass a frame array through"""
+    import cv2
+
+    if isinstance(source, (str, Path)):
+        frame = cv2.imread(str(source))
+        if frame is None:
+            raise FileNotFoundError(f"Could not read image: {source}")
+        return frame
+    return source
+
+
+def collect_image_paths(source):
+    """
+    Expand a directory or glob pattern into a sorted list of image paths
+
+    Args:
+        source: Directory path or glob pattern (e.g. "shots/*.png")
+
+    Returns:
+        List of image paths
+    """
+    if Path(source).is_dir():
+        candidates = Path(source).iterdir()
+    else:
+        candidates = (Path(p) for p in glob.glob(source, recursive=True))
+    return sorted(str(p) for p in candidates
+                  if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS)
+
+
+def _iter_capture(cap, live):
+    """
+    Yield (frame_index, timestamp, frame, frame_index) from a VideoCapture
+
+    Live sources are stamped with wall-clock time, video files with their
+    media time in seconds.
+    """
+    import cv2
+
+    index = 0
+    while cap.isOpened():
+        ret, frame = cap.read()
+        if not ret:
+            break
+        timestamp = time.time() if live else cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+        yield index, timestamp, frame, index
+        index += 1
+
+
+def _iter_ring(ring, filled, capture, renderer=None):
+    """
+    Yield (frame_index, timestamp, frame, slot) for ring slots filled by a capture process
+
+    ``frame`` is a view into the shared slot, valid until the slot is released.
+    Raises RuntimeError if the render process dies, since it would never hand
+    its slots back.
+    """
+    while True:
+        try:
+            slot = filled.get(timeout=0.5)
+        except queue.Empty:
+            _check_renderer(renderer)
+            if not capture.is_alive():
+                return
+            continue
+        if slot is None:
+            return
+        index, timestamp = ring.get_meta(slot)
+        yield index, timestamp, ring.frame(slot), slot
+
+
+def _check_renderer(renderer):
+    """Raise if a shared-memory render process ended before being told to"""
+    if renderer is not None and not renderer.is_alive() and renderer.exitcode != 0:
+        raise RuntimeError(f"Render process exited with code {renderer.exitcode}")
+
+
+def _decode_images(image_paths, workers=4, prefetch=32):
+    """
+    Decode images on a thread pool, yielding (path, frame) in input order
+
+    At most ``prefetch`` decoded images are held in memory at once.
+    ``frame`` is None when the file could not be read.
+    """
+    import cv2
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for path in image_paths:
+            pending.append((path, pool.submit(cv2.imread, path)))
+            if len(pending) >= prefetch:
+                path_done, future = pending.popleft()
+                yield path_done, future.result()
+        while pending:
+            path_done, future = pending.popleft()
+            yield path_done, future.result()
+
+
+def _put_until_stopped(q, item, stop, poll=0.1):
+    """Put ``item`` on a bounded queue, giving up once ``stop`` is set"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=poll)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def print_remote_results(records):
+    """Print detection server results in the same format as detect_image"""
+    for record in records:
+        print(f"\nProcessing image: {record['image']}")
+        if 'error' in record:
+            print(f"Error: Could not read image: {record['image']}")
+            continue
+        print(f"Found {len(record['detections'])} rune(s)")
+        for i, det in enumerate(record['detections']):
+            print(f"  Rune {i+1}: {det['class_name']} (confidence: {det['confidence']:.2f})")
+
+
+def run_source(detector, args):
+    """Dispatch a parsed --source or --sources to the matching RuneDetector method"""
+    if args.sources:
+        detector.detect_streams(
+            [int(s) if s.isdigit() else s for s in args.sources],
+            output_dir=args.output,
+            show=not args.no_show,
+            batch_size=args.batch_size,
+            buffer_size=args.queue_size
+        )
+        return
+
+    source_path = Path(args.source)
+
+    if args.watch:
+        from rune_watch import HotFolder
+
+        HotFolder(
+            detector,
+            args.source,
+            IMAGE_EXTENSIONS,
+            results_path=args.output,
+            sidecars=args.sidecars,
+            checkpoint_path=args.checkpoint,
+            batch_size=args.batch_size or 16,
+            max_wait_ms=args.max_wait_ms,
+            workers=args.workers,
+            poll_interval=args.poll_interval
+        ).run()
+        return
+
+    if args.source.lower() == 'webcam':
+        detector.detect_webcam(
+            camera_id=args.camera_id,
+            show=not args.no_show,
+            low_latency=args.low_latency,
+            motion_threshold=args.motion_threshold,
+            motion_refresh=args.motion_refresh,
+            detect_every=args.detect_every,
+            adaptive_interval=args.adaptive_interval,
+            shared_memory=args.shared_memory,
+            ring_slots=args.ring_slots
+        )
+        return
+
+    if source_path.is_dir() or glob.has_magic(args.source):
+        image_paths = collect_image_paths(args.source)
+        if not image_paths:
+            print(f"Error: No images found in: {args.source}")
+            return
+        results_path = args.output or str(Path('output') / f"batch_{time.strftime('%Y%m%d_%H%M%S')}.jsonl")
+        detector.detect_batch(
+            image_paths,
+            results_path=results_path,
+            batch_size=args.batch_size or 16,
+            workers=args.workers
+        )
+        return
+
+    # Determine if image or video
+    ext = source_path.suffix.lower()
+
+    if ext in IMAGE_EXTENSIONS:
+        detector.detect_image(
+            str(source_path),
+            output_path=args.output,
+            show=not args.no_show
+        )
+    elif ext in VIDEO_EXTENSIONS:
+        detector.detect_video(
+            str(source_path),
+            output_path=args.output,
+            show=not args.no_show,
+            pipelined=args.pipeline,
+            queue_size=args.queue_size,
+            motion_threshold=args.motion_threshold,
+            motion_refresh=args.motion_refresh,
+            detect_every=args.detect_every,
+            adaptive_interval=args.adaptive_interval,
+            clip_dir=args.clips,
+            pre_roll=args.pre_roll,
+            post_roll=args.post_roll,
+            shared_memory=args.shared_memory,
+            ring_slots=args.ring_slots
+        )
+    else:
+        print(f"Error: Unsupported file format: {ext}")
+        print(f"Supported image formats: {', '.join(IMAGE_EXTENSIONS)}")
+        print(f"Supported video formats: {', '.join(VIDEO_EXTENSIONS)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='YOLO12 Rune Detection')
+    parser.add_argument('--source', type=str,
+                        help='Path to image, video, image directory or glob pattern, or "webcam" for camera')
+    parser.add_argument('--model', type=str, default='models/best.pt', help='Path to YOLO12 model (default: models/best.pt)')
+    parser.add_argument('--conf', type=float, default=0.25, help='Confidence threshold (default: 0.25)')
+    parser.add_argument('--iou', type=float, default=0.45, help='IoU threshold (default: 0.45)')
+    parser.add_argument('--backend', type=str, default='torch', choices=BACKENDS,
+                        help='Inference backend; onnx/openvino export the weights once and cache them (default: torch)')
+    parser.add_argument('--imgsz', type=int, default=640, help='Inference image size (default: 640)')
+    parser.add_argument('--tile-size', type=int,
+                        help='Enable tiled inference with square tiles of this size (e.g. 640) for high-res frames')
+    parser.add_argument('--tile-overlap', type=float, default=0.2,
+                        help='Overlap between neighbouring tiles as a fraction of tile size (default: 0.2)')
+    parser.add_argument('--no-full-frame', action='store_true',
+                        help='Tiled inference: skip the additional downscaled full-frame pass')
+    parser.add_argument('--tile-merge', type=str, default='nms', choices=('nms', 'wbf'),
+                        help='Tiled inference: merge duplicates with NMS or weighted boxes fusion (default: nms)')
+    parser.add_argument('--cascade-model', type=str,
+                        help='Secondary, more accurate model (e.g. a yolo12m best.pt) run only where --model is unsure')
+    parser.add_argument('--cascade-band', type=float, nargs=2, default=[0.1, 0.5], metavar=('LOW', 'HIGH'),
+                        help='Cascade: escalate when the top primary confidence is in [LOW, HIGH) (default: 0.1 0.5)')
+    parser.add_argument('--cascade-crops', action='store_true',
+                        help='Cascade: run the secondary model on crops around unsure boxes instead of whole frames')
+    parser.add_argument('--cache-dir', type=str,
+                        help='Enable the on-disk result cache in this directory (image/directory/glob sources)')
+    parser.add_argument('--cache-size-mb', type=int, default=512,
+                        help='Result cache size limit before LRU eviction (default: 512)')
+    parser.add_argument('--sources', type=str, nargs='+',
+                        help='Several camera ids and/or video files processed together by one model')
+    parser.add_argument('--output', type=str,
+                        help='Output path for result (JSON Lines results file for directory/glob sources, '
+                             'output directory for --sources)')
+    parser.add_argument('--no-show', action='store_true', help='Do not display results')
+    parser.add_argument('--camera-id', type=int, default=0, help='Camera device ID (default: 0)')
+    parser.add_argument('--batch-size', type=int,
+                        help='Frames per inference batch (default: 16 for directory/glob sources, '
+                             'number of streams for --sources)')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='Image decoding threads for directory/glob sources (default: 4)')
+    parser.add_argument('--watch', action='store_true',
+                        help='Directory source: keep running and detect new images as they arrive '
+                             '(results appended to --output and/or written as --sidecars)')
+    parser.add_argument('--sidecars', action='store_true',
+                        help='Watch: write <image>.json with the detections next to each image')
+    parser.add_argument('--checkpoint', type=str,
+                        help='Watch: processed-files journal (default: .rune_checkpoint.jsonl in the folder)')
+    parser.add_argument('--poll-interval', type=float,
+                        help='Watch: scan the folder every N seconds instead of using inotify (network shares)')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='Decode, infer and encode video on separate threads')
+    parser.add_argument('--queue-size', type=int, default=8,
+                        help='Frames buffered between pipeline stages (default: 8)')
+    parser.add_argument('--motion-threshold', type=float,
+                        help='Video/webcam: reuse previous detections when the frame changed less than this '
+                             '(mean 0-255 difference of a downscaled frame, e.g. 2.0)')
+    parser.add_argument('--motion-refresh', type=int, default=30,
+                        help='Force inference at least every N frames when motion gating (default: 30)')
+    parser.add_argument('--detect-every', type=int,
+                        help='Video/webcam: run the detector every N frames and track boxes with optical flow '
+                             'in between (re-detects early when tracking is lost)')
+    parser.add_argument('--adaptive-interval', action='store_true',
+                        help='With --detect-every: grow N while tracking holds, halve it when a track is lost')
+    parser.add_argument('--clips', type=str,
+                        help='Video: write only short clips around detections and a detections sidecar to this directory')
+    parser.add_argument('--pre-roll', type=float, default=2.0,
+                        help='Clips: seconds kept before the first detection (default: 2.0)')
+    parser.add_argument('--post-roll', type=float, default=2.0,
+                        help='Clips: seconds kept after the last detection (default: 2.0)')
+    parser.add_argument('--shared-memory', action='store_true',
+                        help='Video/webcam: capture, detect and render in separate processes sharing frame memory')
+    parser.add_argument('--ring-slots', type=int, default=8,
+                        help='Frame slots in the shared-memory ring (default: 8)')
+    parser.add_argument('--shard', action='store_true',
+                        help='Video: split into frame ranges processed by separate worker processes')
+    parser.add_argument('--shard-workers', type=int,
+                        help='Number of shard worker processes (default: physical cores / torch threads)')
+    parser.add_argument('--shard-threads', type=int,
+                        help=f'Torch threads per shard worker (default: {SHARD_THREADS})')
+    parser.add_argument('--results', type=str,
+                        help='Per-frame JSON Lines detections file for sharded video (default: next to --output)')
+    parser.add_argument('--low-latency', action='store_true',
+                        help='Webcam: always process the newest frame and report capture-to-display latency '
+                             '(capture-to-detection with --no-show)')
+    parser.add_argument('--serve', action='store_true',
+                        help='Run a persistent detection server that keeps the model loaded')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Detection server host (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='Detection server port (default: 8765)')
+    parser.add_argument('--max-batch', type=int, default=8,
+                        help='Server: maximum frames per micro-batch (default: 8)')
+    parser.add_argument('--max-wait-ms', type=float,
+                        help='Server/watch: maximum time a request or new file waits for a batch to fill '
+                             '(default: 5 ms for --serve, 500 ms for --watch)')
+    parser.add_argument('--no-server', action='store_true',
+                        help='Always load the model locally, even if a detection server is running')
+    parser.add_argument('--no-profile', action='store_true',
+                        help='Ignore the machine thread profile saved by rune_tuning.py')
+    parser.add_argument('--metrics-json', type=str,
+                        help='Record per-stage latency histograms and write them to this JSON file on exit')
+    parser.add_argument('--metrics-prom', type=str,
+                        help='Record per-stage latencies and keep this Prometheus text file updated while running')
+    parser.add_argument('--metrics-port', type=int,
+                        help='Record per-stage latencies and serve them at http://127.0.0.1:PORT/metrics')
+
+    args = parser.parse_args()
+
+    # Watch batches files that arrive some time apart, the server concurrent requests
+    if args.max_wait_ms is None:
+        args.max_wait_ms = 500.0 if args.watch else 5.0
+
+    if args.cascade_model and args.tile_size:
+        print("Error: --cascade-model cannot be combined with --tile-size")
+        return
+    if args.shared_memory and (args.pipeline or args.clips):
+        print("Error: --shared-memory cannot be combined with --pipeline or --clips")
+        return
+
+    thread_profile = None
+    if not args.no_profile:
+        from rune_tuning import load_profile
+
+        thread_profile = load_profile('inference')
+
+    if args.serve:
+        from rune_server import DetectionServer
+
+        detector = RuneDetector(
+            model_path=args.model,
+            conf_threshold=args.conf,
+            iou_threshold=args.iou,
+            backend=args.backend,
+            imgsz=args.imgsz,
+            tile_size=args.tile_size,
+            tile_overlap=args.tile_overlap,
+            tile_full_frame=not args.no_full_frame,
+            tile_merge=args.tile_merge,
+            thread_profile=thread_profile,
+            cascade_model=args.cascade_model,
+            cascade_band=tuple(args.cascade_band),
+            cascade_crops=args.cascade_crops
+        )
+        DetectionServer(
+            detector,
+            host=args.host,
+            port=args.port,
+            max_batch_size=args.max_batch,
+            max_wait_ms=args.max_wait_ms
+        ).serve_forever()
+        return
+
+    # Process based on source type
+    if not args.source and not args.sources:
+        print("Error: --source or --sources is required")
+        print("Examples:")
+        print("  python detect_rune.py --source image.jpg")
+        print("  python detect_rune.py --source video.mp4 --output output.mp4")
+        print("  python detect_rune.py --source screenshots/ --output results.jsonl")
+        print('  python detect_rune.py --source "screenshots/*.png"')
+        print("  python detect_rune.py --source inbox/ --watch --output results.jsonl")
+        print("  python detect_rune.py --source webcam")
+        print("  python detect_rune.py --sources 0 1 client3.mp4 --output streams/")
+        print("  python detect_rune.py --serve")
+        return
+
+    if args.sources:
+        missing = [s for s in args.sources if not s.isdigit() and not Path(s).exists()]
+        if missing:
+            print(f"Error: Source file not found: {', '.join(missing)}")
+            return
+    else:
+        # Forward plain image lookups to a running server instead of loading the model
+        source_path = Path(args.source)
+        if (not args.no_server and args.no_show and not args.output
+                and source_path.suffix.lower() in IMAGE_EXTENSIONS and source_path.is_file()):
+            from rune_server import DetectionClient, ServerError
+
+            client = DetectionClient(f'http://{args.host}:{args.port}')
+            health = client.health()
+            if health is not None:
+                local = detection_settings(
+                    args.model, args.backend, args.conf, args.iou, args.imgsz,
+                    args.tile_size, args.tile_overlap, not args.no_full_frame, args.tile_merge,
+                    args.cascade_model, args.cascade_band, args.cascade_crops
+                )
+                remote = health.get('settings') or {}
+                different = [key for key in local if remote.get(key) != local[key]]
+                if different:
+                    print(f"Detection server at {client.url} runs with different options "
+                          f"({', '.join(different)}); detecting locally")
+                else:
+                    try:
+                        print_remote_results(client.detect([source_path.resolve()]))
+                        return
+                    except ServerError as e:
+                        print(f"Detection server request failed ({e}); detecting locally")
+
+        if args.watch and not source_path.is_dir():
+            print(f"Error: --watch needs a directory source: {args.source}")
+            return
+        if args.watch and not args.output and not args.sidecars:
+            print("Error: --watch needs --output (results log) and/or --sidecars")
+            return
+
+        # Fail before loading the model
+        if args.source.lower() != 'webcam' and not glob.has_magic(args.source) and not source_path.exists():
+            print(f"Error: Source file not found: {args.source}")
+            return
+
+    # Sharded video: only the worker processes load a model
+    if args.shard and args.source and Path(args.source).suffix.lower() in VIDEO_EXTENSIONS:
+        shard_video(
+            args.source,
+            {
+                'model_path': args.model,
+                'conf_threshold': args.conf,
+                'iou_threshold': args.iou,
+                'backend': args.backend,
+                'imgsz': args.imgsz,
+                'tile_size': args.tile_size,
+                'tile_overlap': args.tile_overlap,
+                'tile_full_frame': not args.no_full_frame,
+                'tile_merge': args.tile_merge,
+                'cascade_model': args.cascade_model,
+                'cascade_band': tuple(args.cascade_band),
+                'cascade_crops': args.cascade_crops
+            },
+            output_path=args.output,
+            results_path=args.results,
+            workers=args.shard_workers,
+            threads=args.shard_threads
+        )
+        return
+
+    # Per-stage latency instrumentation is opt-in
+    metrics = None
+    if args.metrics_json or args.metrics_prom or args.metrics_port:
+        from rune_metrics import StageMetrics
+
+        metrics = StageMetrics()
+
+    # Initialize detector
+    detector = RuneDetector(
+        model_path=args.model,
+        conf_threshold=args.conf,
+        iou_threshold=args.iou,
+        backend=args.backend,
+        imgsz=args.imgsz,
+        tile_size=args.tile_size,
+        tile_overlap=args.tile_overlap,
+        tile_full_frame=not args.no_full_frame,
+        tile_merge=args.tile_merge,
+        cache_dir=args.cache_dir,
+        cache_size_mb=args.cache_size_mb,
+        metrics=metrics,
+        thread_profile=thread_profile,
+        cascade_model=args.cascade_model,
+        cascade_band=tuple(args.cascade_band),
+        cascade_crops=args.cascade_crops
+    )
+
+    if metrics:
+        metrics.start_exporter(prom_path=args.metrics_prom, port=args.metrics_port)
+    try:
+        run_source(detector, args)
+    finally:
+        detector.cascade_report()
+        if metrics:
+            metrics.stop_exporter()
+            metrics.print_report()
+            if args.metrics_json:
+                metrics.write_json(args.metrics_json)
+                print(f"Saved stage metrics to: {args.metrics_json}")
 
 
 if __name__ == '__main__':
@@ -7,7 +7,6 @@ Download and prepare rune datasets from Roboflow
 import argparse
 import os
 from pathlib import Path
-from roboflow import Roboflow
 
 
 class RoboflowDatasetManager:
@@ -20,6 +19,9 @@ class RoboflowDatasetManager:
         Args:
             api_key: Roboflow API key
         """
+        # Imported here so --help and argument errors skip loading the SDK
+        from roboflow import Roboflow
+
         self.api_key = api_key
         self.rf = Roboflow(api_key=api_key)
         print("Roboflow client initialized")
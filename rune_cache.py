@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Rune Detection Result Cache
+On-disk cache of detection results keyed by image content and detector settings
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+
+class ResultCache:
+    """
+    Size-bounded LRU cache of detection results on disk
+
+    Entries are keyed by the SHA-256 of the encoded image bytes combined with
+    everything that changes the result: model weights hash, conf/iou
+    thresholds, imgsz and tiling settings. A hit returns stored arrays
+    without decoding the image or running the model.
+    """
+
+    def __init__(self, cache_dir, settings, max_bytes=512 * 1024 * 1024):
+        """
+        Initialize the result cache
+
+        Args:
+            cache_dir: Directory holding cache entries
+            settings: Dict of detector settings that affect results (part of every key)
+            max_bytes: Total size of entries kept before least recently used ones are evicted
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.settings_key = repr(sorted(settings.items())).encode('utf-8')
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        # Oldest first; rebuilt from file mtimes, which hits refresh
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        entries = []
+        for path in self.cache_dir.glob('*/*.npz'):
+            stat = path.stat()
+            entries.append((stat.st_mtime, path.stem, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._total_bytes += size
+
+    def key_for_bytes(self, data):
+        """Cache key for encoded image bytes"""
+        digest = hashlib.sha256(self.settings_key)
+        digest.update(data)
+        return digest.hexdigest()
+
+    def key_for_file(self, path):
+        """Cache key for an image file, or None if it cannot be read"""
+        try:
+            with open(path, 'rb') as f:
+                return self.key_for_bytes(f.read())
+        except OSError:
+            return None
+
+    def _path(self, key):
+        return self.cache_dir / key[:2] / f'{key}.npz'
+
+    def get(self, key):
+        """
+        Look up cached arrays
+
+        Returns:
+            Dict with 'xyxy', 'conf', 'class_ids' and 'orig_shape' arrays, or None
+        """
+        path = self._path(key)
+        with self._lock:
+            known = key in self._entries
+        if known:
+            try:
+                with np.load(path) as data:
+                    entry = {name: data[name] for name in data.files}
+                os.utime(path)
+            except (OSError, ValueError):
+                entry = None
+            if entry is not None:
+                with self._lock:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                return entry
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self.misses += 1
+        return None
+
+    def put(self, key, xyxy, conf, class_ids, orig_shape):
+        """Store detection arrays for a key, evicting least recently used entries if needed"""
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        tmp_path = path.with_name(f'{key}.{os.getpid()}.{threading.get_ident()}.tmp.npz')
+        np.savez(tmp_path, xyxy=xyxy, conf=conf, class_ids=class_ids,
+                 orig_shape=np.asarray(orig_shape or (0, 0), dtype=np.int32))
+        os.replace(tmp_path, path)
+        size = path.stat().st_size
+
+        with self._lock:
+            self._total_bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, old_size = self._entries.popitem(last=False)
+                self._total_bytes -= old_size
+                self.evictions += 1
+                try:
+                    self._path(old_key).unlink()
+                except OSError:
+                    pass
+
+    def stats(self):
+        """Return hit/miss counters and cache size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'size_mb': round(self._total_bytes / (1024 * 1024), 2)
+            }
+
+    def report(self):
+        stats = self.stats()
+        print(f"Result cache: {stats['hits']} hit(s), {stats['misses']} miss(es) "
+              f"({stats['hit_rate'] * 100:.1f}% hit rate), {stats['entries']} entries, "
+              f"{stats['size_mb']:.1f} MB, {stats['evictions']} eviction(s)")
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Rune Training Image Store
+Decode and resize training images once into a memory-mapped array store
+"""
+
+import functools
+import hashlib
+import json
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+STORE_VERSION = 2
+# BaseDataset.load_image state the store reader keeps up to date
+DATASET_ATTRS = ('ims', 'im_hw0', 'im_hw', 'buffer', 'max_buffer_length')
+
+
+class ImageStore:
+    """
+    Memory-mapped store of dataset images resized for one imgsz
+
+    Every image is decoded once and resized the way ultralytics'
+    BaseDataset.load_image does (long side to imgsz, aspect ratio kept,
+    INTER_AREA downscaling for non-augmented validation sets), then saved
+    top-left in a zero-padded imgsz x imgsz x 3 slot of one .npy file.
+    A JSON manifest records each source file's size, mtime and SHA-1
+    with its original and resized shapes. Slots are read through
+    np.load(mmap_mode='r'), so later epochs come from the page cache
+    without any decoding.
+    """
+
+    def __init__(self, store_dir, name, imgsz, augment=True):
+        """
+        Args:
+            store_dir: Directory holding the store files
+            name: Store name, e.g. from store_name() for a dataset split
+            imgsz: Training image size the slots are resized for
+            augment: Whether the dataset reading the store augments (training
+                split); selects the resize interpolation like load_image does
+        """
+        self.store_dir = Path(store_dir)
+        self.imgsz = imgsz
+        self.augment = augment
+        stem = f'{name}_{imgsz}' if augment else f'{name}_{imgsz}_noaug'
+        self.array_path = self.store_dir / f'{stem}.npy'
+        self.manifest_path = self.store_dir / f'{stem}.json'
+        # Absolute source path -> (slot, (h0, w0), (h, w))
+        self.slots = {}
+        self._array = None
+
+    def __getstate__(self):
+        # Data-loader workers reopen the memory map instead of receiving a copy
+        state = self.__dict__.copy()
+        state['_array'] = None
+        return state
+
+    def prepare(self, image_files, workers=8):
+        """
+        Make sure every file has an up-to-date slot
+
+        Files whose size and mtime still match the manifest are trusted.
+        Otherwise the file is hashed and only re-decoded if its content
+        changed. A file missing from the store (or a different imgsz)
+        rebuilds the whole store.
+
+        Args:
+            image_files: Source image paths
+            workers: Decoding threads
+
+        Returns:
+            Number of images decoded
+        """
+        files = [os.path.abspath(f) for f in image_files]
+        manifest = self._load_manifest()
+        if manifest is None or not set(files) <= set(manifest['files']):
+            return self._build(sorted(set(files)), workers)
+
+        index = {path: i for i, path in enumerate(manifest['files'])}
+        entries = manifest['entries']
+        stale = []
+        for path in files:
+            i = index[path]
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if [stat.st_size, stat.st_mtime_ns] != entries[i][:2]:
+                stale.append(i)
+
+        decoded = 0
+        if stale:
+            array = np.load(self.array_path, mmap_mode='r+')
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                loaded = pool.map(lambda i: _load_entry(manifest['files'][i], self.imgsz, self.augment, entries[i]),
+                                  stale)
+                for i, (entry, image) in zip(stale, loaded):
+                    if image is not None:
+                        _write_slot(array, i, image)
+                        decoded += 1
+                    entries[i] = entry
+            array.flush()
+            del array
+            self._write_manifest(manifest)
+            print(f"Image store {self.array_path.name}: {len(stale)} changed file(s), {decoded} re-decoded")
+
+        self._set_slots(manifest)
+        return decoded
+
+    def _build(self, files, workers):
+        print(f"Image store {self.array_path.name}: decoding {len(files)} image(s) at imgsz {self.imgsz}...")
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        # A store without its manifest is never trusted, so drop the manifest first
+        self.manifest_path.unlink(missing_ok=True)
+        tmp_path = self.array_path.with_name(f'.{self.array_path.name}.tmp')
+        array = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8,
+                                          shape=(len(files), self.imgsz, self.imgsz, 3))
+        entries = []
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            loaded = pool.map(lambda path: _load_entry(path, self.imgsz, self.augment), files)
+            for i, (entry, image) in enumerate(loaded):
+                if image is not None:
+                    _write_slot(array, i, image)
+                entries.append(entry)
+                if (i + 1) % 500 == 0:
+                    print(f"  {i + 1}/{len(files)}")
+        array.flush()
+        del array
+        os.replace(tmp_path, self.array_path)
+
+        manifest = {'version': STORE_VERSION, 'imgsz': self.imgsz, 'augment': self.augment,
+                    'files': files, 'entries': entries}
+        self._write_manifest(manifest)
+        self._set_slots(manifest)
+        unreadable = sum(1 for entry in entries if not entry[5])
+        print(f"Image store {self.array_path.name}: {len(files) - unreadable} image(s), "
+              f"{self.array_path.stat().st_size / 1024 ** 3:.2f} GB"
+              + (f", {unreadable} unreadable (left to the normal loader)" if unreadable else ""))
+        return len(files) - unreadable
+
+    def _load_manifest(self):
+        if not (self.manifest_path.exists() and self.array_path.exists()):
+            return None
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (manifest.get('version') != STORE_VERSION or manifest.get('imgsz') != self.imgsz
+                or manifest.get('augment') != self.augment):
+            return None
+        return manifest
+
+    def _write_manifest(self, manifest):
+        tmp_path = self.manifest_path.with_name(f'.{self.manifest_path.name}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _set_slots(self, manifest):
+        self.slots = {
+            path: (i, (h0, w0), (h, w))
+            for i, (path, (_, _, _, h0, w0, h, w)) in enumerate(zip(manifest['files'], manifest['entries']))
+            if h
+        }
+        self._array = None
+
+    def read(self, slot):
+        """
+        Copy one image out of the store
+
+        Args:
+            slot: Value from ``slots``
+
+        Returns:
+            (image, (h0, w0)) with the image resized to imgsz on its long side
+        """
+        if self._array is None:
+            self._array = np.load(self.array_path, mmap_mode='r')
+        i, hw0, (h, w) = slot
+        # Augmentations modify images in place, so never hand out the mapped pages
+        return self._array[i, :h, :w].copy(), hw0
+
+    def attach(self, dataset):
+        """
+        Serve an ultralytics dataset's load_image from this store
+
+        Images the store does not hold fall back to the dataset's own loader.
+        The reader keeps load_image's private mosaic buffer state, so a
+        dataset without those attributes (a different ultralytics version)
+        is left untouched.
+
+        Returns:
+            Number of dataset images served from the store, or None if the
+            dataset is not supported
+        """
+        if not all(hasattr(dataset, attr) for attr in DATASET_ATTRS):
+            return None
+        dataset.image_store = self
+        dataset.store_slots = [self.slots.get(os.path.abspath(f)) for f in dataset.im_files]
+        dataset.load_image = functools.partial(_load_image_from_store, dataset)
+        return sum(slot is not None for slot in dataset.store_slots)
+
+
+def store_name(img_path):
+    """Store name for a dataset split path (or list of paths) from data.yaml"""
+    digest = hashlib.sha1(repr(img_path).encode('utf-8')).hexdigest()[:10]
+    first = img_path[0] if isinstance(img_path, (list, tuple)) else img_path
+    return f'{Path(str(first)).name}_{digest}'
+
+
+def dataset_image_files(sources):
+    """Image paths of a data.yaml split: directories (recursive), .txt image lists, or a list of them"""
+    from ultralytics.data.utils import IMG_FORMATS
+
+    images = []
+    for source in (sources if isinstance(sources, (list, tuple)) else [sources]):
+        source = Path(source)
+        if source.is_dir():
+            images.extend(p for p in sorted(source.rglob('*')) if p.suffix[1:].lower() in IMG_FORMATS)
+        elif source.suffix == '.txt':
+            parent = source.parent
+            for line in source.read_text().splitlines():
+                line = line.strip()
+                if line:
+                    path = Path(line)
+                    images.append(path if path.is_absolute() else parent / path)
+        elif source.suffix[1:].lower() in IMG_FORMATS:
+            images.append(source)
+    return [str(p) for p in images]
+
+
+def attach_image_store(dataset, store_dir, img_path, imgsz, workers=8):
+    """
+    Prepare the store for a dataset split and attach it to the dataset
+
+    Args:
+        dataset: ultralytics YOLODataset
+        store_dir: Directory holding store files
+        img_path: The split's path from data.yaml (names the store)
+        imgsz: Training image size
+        workers: Decoding threads for new or changed images
+
+    Returns:
+        The ImageStore, or None if the dataset cannot use it
+    """
+    if getattr(dataset, 'cache', None) == 'ram' or getattr(dataset, 'channels', 3) != 3:
+        print("Image store skipped: dataset uses the RAM cache or non-BGR images")
+        return None
+    store = ImageStore(store_dir, store_name(img_path), imgsz, augment=dataset.augment)
+    store.prepare(dataset.im_files, workers=workers)
+    served = store.attach(dataset)
+    if served is None:
+        print("Image store skipped: this ultralytics version's dataset loader is not supported")
+        return None
+    print(f"Image store {store.array_path.name}: serving {served}/{len(dataset.im_files)} image(s)")
+    return store
+
+
+def _load_entry(path, imgsz, augment, known=None):
+    """
+    Read one source image
+
+    Returns:
+        (manifest entry [size, mtime_ns, sha1, h0, w0, h, w], resized image),
+        with the image None when ``known`` already has this content or the
+        file cannot be decoded (h = w = 0)
+    """
+    try:
+        stat = os.stat(path)
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return [0, 0, '', 0, 0, 0, 0], None
+    digest = hashlib.sha1(data).hexdigest()
+    if known is not None and known[2] == digest:
+        return [stat.st_size, stat.st_mtime_ns, digest] + known[3:], None
+
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return [stat.st_size, stat.st_mtime_ns, digest, 0, 0, 0, 0], None
+    h0, w0 = image.shape[:2]
+    image = resize_long_side(image, imgsz, augment)
+    h, w = image.shape[:2]
+    return [stat.st_size, stat.st_mtime_ns, digest, h0, w0, h, w], image
+
+
+def resize_long_side(image, imgsz, augment=True):
+    """Resize so the long side is imgsz, matching ultralytics' BaseDataset.load_image in rect mode"""
+    h0, w0 = image.shape[:2]
+    r = imgsz / max(h0, w0)
+    if r != 1:
+        w, h = min(math.ceil(w0 * r), imgsz), min(math.ceil(h0 * r), imgsz)
+        interpolation = cv2.INTER_LINEAR if augment or r > 1 else cv2.INTER_AREA
+        image = cv2.resize(image, (w, h), interpolation=interpolation)
+    return image
+
+
+def _write_slot(array, i, image):
+    h, w = image.shape[:2]
+    array[i] = 0
+    array[i, :h, :w] = image
+
+
+def _load_image_from_store(dataset, i, rect_mode=True, **kwargs):
+    """BaseDataset.load_image replacement reading from dataset.image_store"""
+    slot = dataset.store_slots[i]
+    if slot is None or not rect_mode or kwargs.get('resize_short') or dataset.ims[i] is not None:
+        return type(dataset).load_image(dataset, i, rect_mode=rect_mode, **kwargs)
+
+    im, hw0 = dataset.image_store.read(slot)
+    # Same mosaic buffer bookkeeping as BaseDataset.load_image
+    if dataset.augment and dataset.cache != 'ram':
+        dataset.ims[i], dataset.im_hw0[i], dataset.im_hw[i] = im, hw0, im.shape[:2]
+        dataset.buffer.append(i)
+        if 1 < len(dataset.buffer) >= dataset.max_buffer_length:
+            j = dataset.buffer.pop(0)
+            dataset.ims[j], dataset.im_hw0[j], dataset.im_hw[j] = None, None, None
+    return im, hw0, im.shape[:2]
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Rune Detection Metrics
+Per-stage latency histograms with JSON and Prometheus text export
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Pipeline stages in the order a frame passes through them
+STAGES = ('decode', 'preprocess', 'inference', 'postprocess', 'annotation', 'encode', 'display')
+
+
+class LatencyHistogram:
+    """
+    Latency histogram with logarithmic buckets (HDR-style)
+
+    Bucket widths grow geometrically, so any recorded value is reported
+    within ``precision`` relative error while memory stays bounded no
+    matter how many values are recorded.
+    """
+
+    def __init__(self, precision=0.01, min_value=0.001):
+        """
+        Args:
+            precision: Maximum relative error of reported values (0.01 = 1%)
+            min_value: Smallest distinguishable value in ms; smaller values share the first bucket
+        """
+        self.min_value = min_value
+        self._log_ratio = math.log1p(2 * precision)
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, value):
+        index = int(math.log(value / self.min_value) / self._log_ratio) if value > self.min_value else 0
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def percentile(self, q):
+        """Value at percentile ``q`` (0-100), or 0.0 if nothing was recorded"""
+        if not self.count:
+            return 0.0
+        target = max(1, math.ceil(self.count * q / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                # Geometric midpoint of the bucket, clamped to the observed range
+                value = self.min_value * math.exp((index + 0.5) * self._log_ratio)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count, 3) if self.count else 0.0,
+            'min': round(self.min, 3) if self.count else 0.0,
+            'p50': round(self.percentile(50), 3),
+            'p95': round(self.percentile(95), 3),
+            'p99': round(self.percentile(99), 3),
+            'max': round(self.max, 3)
+        }
+
+
+class StageMetrics:
+    """
+    Collect per-stage latencies for every frame
+
+    Stages are timed with ``time(stage)`` or recorded directly in
+    milliseconds with ``record(stage, ms)``. Recording is thread-safe, so
+    pipelined decode and inference threads can share one instance.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+        self._lock = threading.Lock()
+        self._exporter_stop = threading.Event()
+        self._exporter_threads = []
+        self._httpd = None
+        self._prom_path = None
+
+    def record(self, stage, ms):
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = LatencyHistogram()
+            histogram.record(ms)
+
+    @contextmanager
+    def time(self, stage):
+        """Context manager recording the wall time of its block under ``stage``"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, (time.perf_counter() - start) * 1000)
+
+    def timed_iter(self, iterable, stage):
+        """Wrap an iterator, recording the time each next() takes under ``stage``"""
+        iterator = iter(iterable)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                self.record(stage, (time.perf_counter() - start) * 1000)
+                yield item
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close:
+                close()
+
+    def to_dict(self):
+        with self._lock:
+            stages = {name: h.summary() for name, h in self.histograms.items() if h.count}
+        return {
+            'unit': 'ms',
+            'uptime_s': round(time.time() - self.started_at, 1),
+            'stages': stages
+        }
+
+    def write_json(self, path):
+        """Write the summary of every stage to a JSON file"""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def prometheus_text(self):
+        """Render stage latencies in the Prometheus text exposition format"""
+        lines = [
+            '# HELP rune_stage_latency_ms Per-frame latency of each detection stage in milliseconds',
+            '# TYPE rune_stage_latency_ms summary'
+        ]
+        with self._lock:
+            for name, histogram in self.histograms.items():
+                if not histogram.count:
+                    continue
+                for q in (0.5, 0.95, 0.99):
+                    lines.append(f'rune_stage_latency_ms{{stage="{name}",quantile="{q}"}} '
+                                 f'{histogram.percentile(q * 100):.3f}')
+                lines.append(f'rune_stage_latency_ms_sum{{stage="{name}"}} {histogram.total:.3f}')
+                lines.append(f'rune_stage_latency_ms_count{{stage="{name}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def start_exporter(self, prom_path=None, port=None, interval=5.0):
+        """
+        Expose live metrics while detection runs
+
+        Args:
+            prom_path: Prometheus text file rewritten every ``interval`` seconds
+                (e.g. for node_exporter's textfile collector)
+            port: Serve GET /metrics on this localhost port
+            interval: Seconds between text file updates
+        """
+        if prom_path:
+            def write_loop():
+                while not self._exporter_stop.wait(interval):
+                    self.write_prometheus(prom_path)
+
+            thread = threading.Thread(target=write_loop, name='rune-metrics-file', daemon=True)
+            thread.start()
+            self._exporter_threads.append(thread)
+            self._prom_path = prom_path
+
+        if port:
+            self._httpd = ThreadingHTTPServer(('127.0.0.1', port), _MetricsHandler)
+            self._httpd.daemon_threads = True
+            self._httpd.metrics = self
+            thread = threading.Thread(target=self._httpd.serve_forever, name='rune-metrics-http', daemon=True)
+            thread.start()
+            self._exporter_threads.append(thread)
+            print(f"Serving metrics on http://127.0.0.1:{port}/metrics")
+
+    def write_prometheus(self, path):
+        """Atomically rewrite a Prometheus text file"""
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+    def stop_exporter(self):
+        """Stop live exporters, writing the text file one last time"""
+        self._exporter_stop.set()
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+        for thread in self._exporter_threads:
+            thread.join(timeout=2.0)
+        if self._prom_path:
+            self.write_prometheus(self._prom_path)
+
+    def print_report(self):
+        """Print a per-stage latency table"""
+        stages = self.to_dict()['stages']
+        if not stages:
+            return
+        print("\n" + "="*60)
+        print("Stage latency (ms)")
+        print("="*60)
+        print(f"{'stage':<12}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+        for name, s in stages.items():
+            print(f"{name:<12}{s['count']:>8}{s['p50']:>10.2f}{s['p95']:>10.2f}{s['p99']:>10.2f}{s['max']:>10.2f}")
+        print("="*60)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serves StageMetrics in Prometheus text format"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = self.server.metrics.prometheus_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Rune Isolated Process Runner
+Run measurements in a fresh Python process and read back their JSON result
+"""
+
+import json
+import subprocess
+
+
+def run_json_process(command, timeout=None):
+    """
+    Run a command in a fresh process and parse the JSON it prints as the last line of stdout
+
+    Returns:
+        The parsed dict, or {'error': message} if the process failed, timed out
+        or did not end with a JSON line
+    """
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {'error': f'timed out after {timeout} s'}
+
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        tail = (completed.stderr or completed.stdout).strip().splitlines()[-1:] or ['no output']
+        return {'error': tail[0]}
+    try:
+        return json.loads(lines[-1])
+    except json.JSONDecodeError:
+        return {'error': lines[-1]}
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Rune Detection Server
+Keeps one warmed-up RuneDetector in memory and serves detections over HTTP on localhost
+"""
+
+import json
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+
+class ServerError(Exception):
+    """A detection server request failed or could not be completed"""
+
+
+class DetectionServer:
+    """
+    HTTP detection server around a single RuneDetector
+
+    Endpoints:
+        GET  /health  - server and model information
+        GET  /stats   - micro-batching queue-depth and batch-size histograms
+        POST /detect  - JSON body {"image": path} or {"images": [paths]},
+                        or raw encoded image bytes (Content-Type: image/*)
+    """
+
+    def __init__(self, detector, host=DEFAULT_HOST, port=DEFAULT_PORT, max_batch_size=8, max_wait_ms=5.0):
+        """
+        Initialize the detection server
+
+        Args:
+            detector: Loaded RuneDetector instance
+            host: Interface to bind (default: localhost only)
+            port: TCP port
+            max_batch_size: Maximum frames per batched model call
+            max_wait_ms: Longest time a frame waits for others to join its batch
+        """
+        self.detector = detector
+        self.host = host
+        self.port = port
+        self.started_at = time.time()
+        self.requests_served = 0
+        self._requests_lock = threading.Lock()
+
+        # Concurrent requests are funneled into batched calls on one model thread
+        self.batcher = MicroBatcher(detector.detect_frames, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+
+        self.httpd = ThreadingHTTPServer((host, port), _DetectionHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.app = self
+
+    def warmup(self):
+        """Run one inference so the first real request does not pay for lazy setup"""
+        import numpy as np
+
+        print("Warming up model...")
+        self.detector.detect_frames([np.zeros((self.detector.imgsz, self.detector.imgsz, 3), dtype=np.uint8)])
+        print("Warm-up done")
+
+    def detect_frames(self, frames):
+        """Run detection on decoded frames, returning one Detections per frame"""
+        futures = [self.batcher.submit(frame) for frame in frames]
+        return [future.result() for future in futures]
+
+    def count_request(self):
+        """Count one served request; handlers run on concurrent threads"""
+        with self._requests_lock:
+            self.requests_served += 1
+
+    def serve_forever(self):
+        """Serve requests until interrupted"""
+        self.warmup()
+        self.batcher.start()
+        print(f"Rune detection server listening on http://{self.host}:{self.port}")
+        print(f"Micro-batching: up to {self.batcher.max_batch_size} frames, "
+              f"{self.batcher.max_wait_ms:g} ms max wait")
+        print("Press Ctrl+C to stop")
+        try:
+            self.httpd.serve_forever()
+        except KeyboardInterrupt:
+            print("\nShutting down server")
+        finally:
+            self.httpd.server_close()
+            self.batcher.stop()
+
+    def health(self):
+        return {
+            'status': 'ok',
+            'model': str(self.detector.model_path),
+            'backend': self.detector.backend,
+            'imgsz': self.detector.imgsz,
+            'conf': self.detector.conf_threshold,
+            'iou': self.detector.iou_threshold,
+            'settings': self.detector.settings(),
+            'uptime_s': round(time.time() - self.started_at, 1),
+            'requests_served': self.requests_served
+        }
+
+
+class MicroBatcher:
+    """
+    Gather concurrently submitted frames into batched detection calls
+
+    A single worker thread takes the first waiting frame, then keeps
+    collecting until ``max_batch_size`` frames are gathered or
+    ``max_wait_ms`` has passed since that first frame, runs one batched
+    call and resolves each caller's Future with its own result.
+    """
+
+    def __init__(self, detect_fn, max_batch_size=8, max_wait_ms=5.0):
+        """
+        Args:
+            detect_fn: Callable taking a list of frames and returning one result per frame
+            max_batch_size: Maximum frames per call
+            max_wait_ms: Batching deadline, measured from the oldest frame in the batch
+        """
+        self.detect_fn = detect_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._queue = queue.Queue()
+        self._thread = None
+        self._running = False
+        self._stats_lock = threading.Lock()
+        self.batch_sizes = Histogram(range(1, max_batch_size + 1))
+        self.queue_depths = Histogram([0, 1, 2, 4, 8, 16, 32, 64, 128])
+        self.batches = 0
+        self.frames = 0
+
+    def start(self):
+        """Start the batching thread"""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='rune-batcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the batching thread"""
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=2.0)
+
+    def submit(self, frame):
+        """Queue one frame, returning a Future for its result"""
+        future = Future()
+        self._queue.put((frame, future))
+        return future
+
+    def _collect(self):
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while self._running:
+            batch = self._collect()
+            if not batch:
+                continue
+
+            with self._stats_lock:
+                self.batch_sizes.add(len(batch))
+                self.queue_depths.add(self._queue.qsize())
+                self.batches += 1
+                self.frames += len(batch)
+
+            frames = [frame for frame, _ in batch]
+            try:
+                results = list(self.detect_fn(frames))
+                if len(results) != len(batch):
+                    raise RuntimeError(f"detect_fn returned {len(results)} results for {len(batch)} frames")
+            except Exception as e:
+                # Every caller is waiting on its future, so none may be left unresolved
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self):
+        """Return batching counters and histograms as a JSON-serializable dict"""
+        with self._stats_lock:
+            return {
+                'batches': self.batches,
+                'frames': self.frames,
+                'mean_batch_size': round(self.frames / self.batches, 2) if self.batches else 0.0,
+                'queue_depth': self._queue.qsize(),
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait_ms,
+                'batch_size_histogram': self.batch_sizes.to_dict(),
+                'queue_depth_histogram': self.queue_depths.to_dict()
+            }
+
+
+class Histogram:
+    """Counts of observed values in buckets with inclusive upper bounds"""
+
+    def __init__(self, bounds):
+        """
+        Args:
+            bounds: Ascending bucket upper bounds; larger values go to a '+Inf' bucket
+        """
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+
+    def add(self, value):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def to_dict(self):
+        labels = [f'<={bound}' for bound in self.bounds] + ['+Inf']
+        return dict(zip(labels, self.counts))
+
+
+class _DetectionHandler(BaseHTTPRequestHandler):
+    """Request handler for DetectionServer"""
+
+    def log_message(self, format, *args):
+        # Keep the console for server-level messages only
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        app = self.server.app
+        if self.path == '/health':
+            self._send_json(200, app.health())
+        elif self.path == '/stats':
+            self._send_json(200, app.batcher.stats())
+        else:
+            self._send_json(404, {'error': f'unknown endpoint: {self.path}'})
+
+    def do_POST(self):
+        import cv2
+        import numpy as np
+
+        app = self.server.app
+        if self.path != '/detect':
+            self._send_json(404, {'error': f'unknown endpoint: {self.path}'})
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        content_type = self.headers.get('Content-Type', '')
+
+        if content_type.startswith('image/') or content_type == 'application/octet-stream':
+            names = ['<upload>']
+            frames = [cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_COLOR)]
+        else:
+            try:
+                request = json.loads(body or b'{}')
+            except json.JSONDecodeError as e:
+                self._send_json(400, {'error': f'invalid JSON: {e}'})
+                return
+            names = request.get('images') or ([request['image']] if 'image' in request else [])
+            frames = [cv2.imread(str(name)) for name in names]
+
+        if not names:
+            self._send_json(400, {'error': 'no image given'})
+            return
+
+        results = [None] * len(names)
+        readable = [i for i, frame in enumerate(frames) if frame is not None]
+        start = time.perf_counter()
+        if readable:
+            try:
+                detections = app.detect_frames([frames[i] for i in readable])
+            except Exception as e:
+                self._send_json(500, {'error': f'detection failed: {e}'})
+                return
+            for i, dets in zip(readable, detections):
+                results[i] = {'image': names[i], 'detections': dets.to_list()}
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        for i, result in enumerate(results):
+            if result is None:
+                results[i] = {'image': names[i], 'error': 'unreadable'}
+
+        app.count_request()
+        self._send_json(200, {'results': results, 'inference_ms': round(elapsed_ms, 2)})
+
+
+class DetectionClient:
+    """Thin client for a running DetectionServer"""
+
+    def __init__(self, url=f'http://{DEFAULT_HOST}:{DEFAULT_PORT}'):
+        """
+        Args:
+            url: Base URL of the detection server
+        """
+        self.url = url.rstrip('/')
+
+    def health(self, timeout=0.2):
+        """Return the server's /health dict, or None if no server answers within ``timeout`` seconds"""
+        try:
+            with urllib.request.urlopen(f'{self.url}/health', timeout=timeout) as response:
+                return json.loads(response.read()) if response.status == 200 else None
+        except (urllib.error.URLError, OSError, ValueError):
+            return None
+
+    def detect(self, image_paths, timeout=60):
+        """
+        Request detections for image files readable by the server
+
+        Args:
+            image_paths: List of image paths
+            timeout: Request timeout in seconds
+
+        Returns:
+            List of per-image result dicts, in request order
+
+        Raises:
+            ServerError: The server returned an error or the connection failed
+        """
+        body = json.dumps({'images': [str(p) for p in image_paths]}).encode('utf-8')
+        request = urllib.request.Request(
+            f'{self.url}/detect',
+            data=body,
+            headers={'Content-Type': 'application/json'}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return json.loads(response.read())['results']
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read())['error']
+            except (ValueError, KeyError, OSError):
+                message = e.reason
+            raise ServerError(f'HTTP {e.code}: {message}') from e
+        except (urllib.error.URLError, OSError, ValueError, KeyError) as e:
+            raise ServerError(str(e)) from e
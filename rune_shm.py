@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Rune Shared-Memory Frame Ring
+Pass video frames between capture, inference and render processes without copying pixels
+"""
+
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class SharedFrameRing:
+    """
+    Ring of preallocated frame slots in one shared memory block
+
+    The block holds ``slots`` frames of a fixed shape followed by per-slot
+    metadata (frame index and timestamp). Processes attach by name and get
+    numpy views onto the same memory, so only slot numbers and detection
+    boxes travel through queues. Slot ownership is handed along by the
+    caller: a free-slot semaphore for the producer, queues for the stages.
+    """
+
+    def __init__(self, shape, slots=8, name=None):
+        """
+        Args:
+            shape: Frame shape, e.g. (1080, 1920, 3)
+            slots: Number of frame slots
+            name: Attach to an existing block with this name instead of creating one
+        """
+        self.shape = tuple(shape)
+        self.slots = slots
+        frame_bytes = int(np.prod(self.shape))
+        # Metadata starts on an 8-byte boundary after the pixel slots
+        self._meta_offset = (slots * frame_bytes + 7) // 8 * 8
+        size = self._meta_offset + slots * 2 * 8
+
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self.frames = np.ndarray((slots, *self.shape), dtype=np.uint8, buffer=self.shm.buf)
+        self.meta = np.ndarray((slots, 2), dtype=np.float64, buffer=self.shm.buf, offset=self._meta_offset)
+
+    @property
+    def spec(self):
+        """Picklable description for attaching from another process"""
+        return {'name': self.shm.name, 'shape': self.shape, 'slots': self.slots}
+
+    @classmethod
+    def attach(cls, spec):
+        return cls(spec['shape'], spec['slots'], name=spec['name'])
+
+    def frame(self, slot):
+        """Zero-copy view of one slot"""
+        return self.frames[slot]
+
+    def set_meta(self, slot, index, timestamp):
+        self.meta[slot] = (index, timestamp)
+
+    def get_meta(self, slot):
+        """Return (frame_index, timestamp) of a slot"""
+        index, timestamp = self.meta[slot]
+        return int(index), float(timestamp)
+
+    def close(self):
+        """
+        Detach from the block; the creating process also frees it
+
+        Views handed out by frame() should be released first. If one is
+        still referenced (e.g. the model kept the last input frame), the
+        mapping stays valid until that view is garbage collected.
+        """
+        self.frames = None
+        self.meta = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass
+        if self.owner:
+            self.shm.unlink()
+
+
+def capture_worker(spec, source, live, free_slots, filled, stop, dropped):
+    """
+    Capture process: decode frames straight into free ring slots
+
+    Args:
+        spec: SharedFrameRing.spec
+        source: Camera id or video path
+        live: Camera source; frames arriving while every slot is busy are
+            read and dropped (counted in ``dropped``) instead of waited for
+        free_slots: Semaphore counting free slots
+        filled: Queue receiving slot numbers in capture order, then None
+        stop: Event set by any stage to end the pipeline
+        dropped: Shared integer counting dropped camera frames
+    """
+    import cv2
+
+    ring = SharedFrameRing.attach(spec)
+    cap = cv2.VideoCapture(source)
+    height, width = ring.shape[:2]
+    next_slot = 0
+    index = 0
+    view = None
+    try:
+        while not stop.is_set():
+            if live:
+                if not free_slots.acquire(timeout=0):
+                    # Keep draining the camera so the next frame is current
+                    if not cap.grab():
+                        break
+                    with dropped.get_lock():
+                        dropped.value += 1
+                    continue
+            elif not free_slots.acquire(timeout=0.1):
+                continue
+
+            slot = next_slot
+            view = ring.frame(slot)
+            # Decode into the slot itself when OpenCV can reuse it
+            ret, frame = cap.read(view)
+            if not ret:
+                free_slots.release()
+                break
+            if frame is not view and not np.shares_memory(frame, view):
+                if frame.shape[:2] != (height, width):
+                    frame = cv2.resize(frame, (width, height))
+                view[...] = frame
+
+            timestamp = time.time() if live else cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+            ring.set_meta(slot, index, timestamp)
+            filled.put(slot)
+            next_slot = (next_slot + 1) % ring.slots
+            index += 1
+    finally:
+        filled.put(None)
+        cap.release()
+        del view
+        ring.close()
+
+
+def render_worker(spec, names, done, free_slots, stop, output_path=None, fps=30, show=True, window='Rune Detection'):
+    """
+    Render process: draw detections on ring slots, then write and/or display them
+
+    Args:
+        spec: SharedFrameRing.spec
+        names: Mapping from class id to class name
+        done: Queue of (slot, xyxy, conf, class_ids) in frame order, then None
+        free_slots: Semaphore released once a slot has been rendered
+        stop: Event set when the user quits the window or rendering fails
+        output_path: Annotated output video (optional)
+        fps: Output video frame rate
+        show: Display frames
+        window: Window title
+    """
+    import cv2
+    from detect_rune import Detections, draw_detections
+
+    ring = SharedFrameRing.attach(spec)
+    height, width = ring.shape[:2]
+    writer = None
+    frame_count = 0
+    start_time = time.time()
+    try:
+        if output_path:
+            writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+        while True:
+            item = done.get()
+            if item is None:
+                break
+            slot, xyxy, conf, class_ids = item
+            frame = ring.frame(slot)
+            draw_detections(frame, Detections(xyxy, conf, class_ids, names))
+
+            frame_count += 1
+            elapsed = time.time() - start_time
+            cv2.putText(frame, f'FPS: {frame_count / elapsed if elapsed > 0 else 0:.1f}',
+                        (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+
+            if writer:
+                writer.write(frame)
+            if show:
+                cv2.imshow(window, frame)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    stop.set()
+            del frame
+            free_slots.release()
+    except BaseException:
+        # Slots are no longer handed back, so end the other stages instead of leaving them waiting
+        stop.set()
+        raise
+    finally:
+        if writer:
+            writer.release()
+        if show:
+            cv2.destroyAllWindows()
+        ring.close()
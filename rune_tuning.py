@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Rune CPU Thread Tuning
+Sweep torch/OpenCV thread counts for inference and data-loader workers for
+training on this machine, and save the fastest settings as a machine profile
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+
+import yaml
+
+# Machine profile read by detect_rune.py and train.py at startup
+PROFILE_PATH = Path(os.environ.get('RUNE_PROFILE', Path.home() / '.autoyolo' / 'machine_profile.json'))
+
+
+def machine_fingerprint():
+    """Identify this machine, so a profile copied from elsewhere is not applied"""
+    return {
+        'node': platform.node(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+def load_profile(section, path=None):
+    """
+    Load one section ('inference' or 'training') of the machine profile
+
+    Returns:
+        Settings dict, or None if there is no profile for this machine
+    """
+    path = Path(path or PROFILE_PATH)
+    if not path.exists():
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            profile = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Warning: Could not read machine profile {path}: {e}")
+        return None
+    if profile.get('machine') != machine_fingerprint():
+        print(f"Warning: Ignoring machine profile {path} tuned on another machine")
+        return None
+    return profile.get(section)
+
+
+def save_profile(section, settings, path=None):
+    """Store one section of the machine profile, keeping the other sections"""
+    path = Path(path or PROFILE_PATH)
+    profile = {}
+    if path.exists():
+        with open(path, 'r', encoding='utf-8') as f:
+            profile = json.load(f)
+    if profile.get('machine') != machine_fingerprint():
+        profile = {'machine': machine_fingerprint()}
+    profile[section] = {**settings, 'tuned_at': time.strftime('%Y-%m-%d %H:%M:%S')}
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, indent=2)
+    print(f"Saved {section} settings to machine profile: {path}")
+
+
+def apply_threads(settings):
+    """
+    Apply torch and OpenCV thread counts from a profile section
+
+    Call after ultralytics has set up its predictor or trainer: both reset
+    torch threads on CPU, and importing ultralytics resets OpenCV threads.
+
+    Args:
+        settings: Dict with any of torch_threads, interop_threads and cv2_threads
+    """
+    import cv2
+    import torch
+
+    if settings.get('torch_threads'):
+        torch.set_num_threads(settings['torch_threads'])
+    if settings.get('interop_threads'):
+        try:
+            torch.set_num_interop_threads(settings['interop_threads'])
+        except RuntimeError:
+            # Only settable before the first inter-op parallel work in a process
+            pass
+    if settings.get('cv2_threads') is not None:
+        cv2.setNumThreads(settings['cv2_threads'])
+
+
+def describe(settings):
+    parts = []
+    if 'workers' in settings:
+        parts.append(f"{settings['workers']} workers")
+    if settings.get('torch_threads'):
+        parts.append(f"torch {settings['torch_threads']} threads")
+    if settings.get('interop_threads'):
+        parts.append(f"{settings['interop_threads']} inter-op")
+    if settings.get('cv2_threads') is not None:
+        parts.append(f"OpenCV {settings['cv2_threads']} threads")
+    return ', '.join(parts)
+
+
+def thread_candidates(limit, extra=()):
+    """Small sweep of thread counts up to ``limit``"""
+    values = {1, 2, 4, max(1, limit // 2), limit, *extra}
+    return sorted(v for v in values if 0 <= v <= limit)
+
+
+def inference_trial(config):
+    """Frames per second of a video-style detect-and-draw loop with the given threads"""
+    from benchmark_rune import synthetic_frames
+    from detect_rune import RuneDetector, draw_detections
+
+    settings = {k: config[k] for k in ('torch_threads', 'interop_threads', 'cv2_threads')}
+    detector = RuneDetector(model_path=config['model'], imgsz=config['imgsz'], thread_profile=settings)
+    frames = synthetic_frames(config['frames'], config['width'], config['height'])
+
+    for _, _, detections, frame in detector.stream(frames[:config['warmup']], with_frames=True):
+        draw_detections(frame, detections)
+
+    measured = frames[config['warmup']:]
+    start = time.perf_counter()
+    for _, _, detections, frame in detector.stream(measured, with_frames=True):
+        draw_detections(frame, detections)
+    elapsed = time.perf_counter() - start
+    return {'fps': round(len(measured) / elapsed, 2)}
+
+
+def training_trial(config):
+    """
+    Images per second through the training data loader with the given workers/threads
+
+    Each batch also runs a forward pass in the main process, so loader
+    workers compete with model compute for cores as they do in training.
+    """
+    import torch
+    from ultralytics import YOLO
+    from ultralytics.cfg import get_cfg
+    from ultralytics.data import build_dataloader, build_yolo_dataset
+    from ultralytics.data.utils import check_det_dataset
+
+    apply_threads({'torch_threads': config['torch_threads']})
+
+    data = check_det_dataset(config['data'])
+    cfg = get_cfg(overrides={'imgsz': config['imgsz'], 'batch': config['batch']})
+    dataset = build_yolo_dataset(cfg, data['train'], config['batch'], data, mode='train')
+    loader = build_dataloader(dataset, config['batch'], config['workers'], shuffle=True)
+    model = YOLO(config['model']).model.float().eval()
+
+    def batches():
+        while True:
+            yield from loader
+
+    images = 0
+    iterator = batches()
+    with torch.no_grad():
+        # First batch includes worker start-up
+        next(iterator)
+        start = time.perf_counter()
+        for _ in range(config['batches']):
+            batch = next(iterator)
+            model(batch['img'].float() / 255)
+            images += len(batch['img'])
+    elapsed = time.perf_counter() - start
+    return {'images_per_sec': round(images / elapsed, 2)}
+
+
+def run_trial(kind, config, timeout=None):
+    """
+    Run one trial in a fresh Python process
+
+    Inter-op threads can only be set once per process, so every setting
+    is measured in its own interpreter.
+    """
+    from rune_process import run_json_process
+
+    command = [sys.executable, str(Path(__file__).resolve()), '--run-trial', kind, json.dumps(config)]
+    return run_json_process(command, timeout)
+
+
+def tune_inference(model, imgsz=640, frames=48, warmup=4, frame_size=(1280, 720), timeout=None):
+    """
+    Find the fastest torch intra-op, inter-op and OpenCV thread counts for detection
+
+    Sweeps one setting at a time (coordinate descent) starting from
+    torch's default of one intra-op thread per physical core.
+
+    Returns:
+        Best settings dict including the measured fps
+    """
+    from detect_rune import physical_cores
+
+    logical = os.cpu_count() or 1
+    cores = physical_cores()
+    sweeps = [
+        ('torch_threads', thread_candidates(logical, extra=(cores,))),
+        ('interop_threads', [v for v in (1, 2, 4) if v <= logical]),
+        ('cv2_threads', thread_candidates(cores, extra=(0,)))
+    ]
+    best = {'torch_threads': cores, 'interop_threads': 1, 'cv2_threads': 0}
+    measured = {}
+
+    print("\n" + "="*60)
+    print(f"Tuning inference threads ({logical} logical / {cores} physical cores)")
+    print("="*60)
+    for name, values in sweeps:
+        for value in values:
+            settings = {**best, name: value}
+            key = tuple(sorted(settings.items()))
+            if key not in measured:
+                config = {**settings, 'model': model, 'imgsz': imgsz, 'frames': frames + warmup,
+                          'warmup': warmup, 'width': frame_size[0], 'height': frame_size[1]}
+                measured[key] = run_trial('inference', config, timeout=timeout)
+                result = measured[key]
+                outcome = f"error: {result['error']}" if 'error' in result else f"{result['fps']:.1f} FPS"
+                print(f"  {describe(settings):<50}{outcome}")
+        scored = [(measured[tuple(sorted({**best, name: v}.items()))].get('fps', 0), v) for v in values]
+        best[name] = max(scored)[1]
+
+    fps = measured[tuple(sorted(best.items()))].get('fps')
+    if not fps:
+        print("Error: No inference trial succeeded")
+        return None
+    print(f"Best: {describe(best)} ({fps:.1f} FPS)")
+    return {**best, 'fps': fps, 'model': str(model), 'imgsz': imgsz}
+
+
+def tune_training(model, data_yaml, imgsz=640, batch=8, batches=20, timeout=None):
+    """
+    Find the fastest data-loader worker count and torch thread count for training
+
+    Returns:
+        Best settings dict including the measured images/sec
+    """
+    from detect_rune import physical_cores
+
+    logical = os.cpu_count() or 1
+    cores = physical_cores()
+    trials = []
+    for workers in sorted({0, 2, 4, cores // 2, cores} & set(range(logical + 1))):
+        for threads in sorted({cores, max(1, cores - workers)}):
+            trials.append({'workers': workers, 'torch_threads': threads})
+
+    print("\n" + "="*60)
+    print(f"Tuning training data loading ({len(trials)} settings, {batches} batches of {batch})")
+    print("="*60)
+    best = None
+    for settings in trials:
+        config = {**settings, 'model': model, 'data': data_yaml, 'imgsz': imgsz, 'batch': batch, 'batches': batches}
+        result = run_trial('training', config, timeout=timeout)
+        if 'error' in result:
+            print(f"  {describe(settings):<50}error: {result['error']}")
+            continue
+        print(f"  {describe(settings):<50}{result['images_per_sec']:.1f} images/sec")
+        if best is None or result['images_per_sec'] > best['images_per_sec']:
+            best = {**settings, 'images_per_sec': result['images_per_sec']}
+
+    if best is None:
+        print("Error: No training trial succeeded")
+        return None
+    print(f"Best: {describe(best)} ({best['images_per_sec']:.1f} images/sec)")
+    return {**best, 'imgsz': imgsz, 'batch': batch}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tune CPU threads for rune detection and training')
+    parser.add_argument('--config', type=str, default='config.yaml', help='Path to config file')
+    parser.add_argument('--model', type=str, help='Detection model for inference tuning (default: config custom_model)')
+    parser.add_argument('--train-model', type=str, help='Weights for training tuning (default: config architecture)')
+    parser.add_argument('--data', type=str, help='Dataset YAML for training tuning (default: config data_yaml)')
+    parser.add_argument('--imgsz', type=int, help='Image size (default: config img_size)')
+    parser.add_argument('--frames', type=int, default=48, help='Frames timed per inference trial (default: 48)')
+    parser.add_argument('--batches', type=int, default=20, help='Batches timed per training trial (default: 20)')
+    parser.add_argument('--skip-inference', action='store_true', help='Only tune training')
+    parser.add_argument('--skip-training', action='store_true', help='Only tune inference')
+    parser.add_argument('--timeout', type=float, default=900, help='Seconds before a trial is abandoned')
+    parser.add_argument('--profile', type=str, default=str(PROFILE_PATH),
+                        help=f'Machine profile path (default: {PROFILE_PATH})')
+    parser.add_argument('--run-trial', nargs=2, metavar=('KIND', 'CONFIG'), help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    # Trial mode: measure one setting and report it on stdout
+    if args.run_trial:
+        kind, config = args.run_trial
+        trial = inference_trial if kind == 'inference' else training_trial
+        print(json.dumps(trial(json.loads(config))))
+        return
+
+    with open(args.config, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    imgsz = args.imgsz or config['training']['img_size']
+
+    if not args.skip_inference:
+        model = args.model or config['model']['custom_model']
+        if not Path(model).exists():
+            print(f"Error: Model not found: {model}")
+        else:
+            best = tune_inference(model, imgsz=imgsz, frames=args.frames, timeout=args.timeout)
+            if best:
+                save_profile('inference', best, args.profile)
+
+    if not args.skip_training:
+        data_yaml = args.data or config['dataset']['data_yaml']
+        train_model = args.train_model or config['model'].get('pretrained') or f"{config['model']['architecture']}.pt"
+        if not Path(data_yaml).exists():
+            print(f"Error: Dataset YAML file not found: {data_yaml}")
+        else:
+            best = tune_training(train_model, data_yaml, imgsz=imgsz, batch=config['training']['batch_size'],
+                                 batches=args.batches, timeout=args.timeout)
+            if best:
+                save_profile('training', best, args.profile)
+
+
+if __name__ == '__main__':
+    main()
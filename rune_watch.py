@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Rune Hot-Folder Watcher
+Detect runes in screenshots as they land in a shared directory, surviving restarts
+"""
+
+import ctypes
+import ctypes.util
+import json
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+
+# inotify event bits (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+# struct inotify_event header: wd, mask, cookie, len (followed by the name)
+_EVENT = struct.Struct('iIII')
+
+
+class _Inotify:
+    """Minimal ctypes binding for Linux inotify"""
+
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify is only available on Linux")
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            libc.inotify_init1.argtypes = [ctypes.c_int]
+            libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        except (OSError, AttributeError) as e:
+            raise OSError(f"inotify is not available: {e}")
+        self._libc = libc
+        # IN_NONBLOCK / IN_CLOEXEC share their values with O_NONBLOCK / O_CLOEXEC
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+    def add_watch(self, path, mask):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(str(path)), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), str(path))
+        return wd
+
+    def read(self, timeout):
+        """Return a list of (wd, mask, name) events, waiting up to ``timeout`` seconds"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FolderWatcher:
+    """
+    Report image files that finished arriving in a directory tree
+
+    With inotify, files are reported on IN_CLOSE_WRITE (written in place) or
+    IN_MOVED_TO (renamed into the folder), so half-written files are not
+    picked up. The polling fallback reports a file once its size and mtime
+    are unchanged across two scans. Files already present at start are
+    reported too; the caller decides which of them are new.
+    """
+
+    def __init__(self, directory, extensions, recursive=True, poll_interval=None):
+        """
+        Args:
+            directory: Folder to watch
+            extensions: Lower-case file suffixes to report, e.g. {'.png', '.jpg'}
+            recursive: Also watch subfolders, including ones created later
+            poll_interval: Scan every N seconds instead of using inotify
+                (needed for network shares, where inotify misses remote writes)
+        """
+        # Absolute paths keep checkpoint entries valid whatever directory the service starts from
+        self.directory = Path(directory).resolve()
+        self.extensions = {ext.lower() for ext in extensions}
+        self.recursive = recursive
+        self.poll_interval = poll_interval
+        self.paths = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._inotify = None
+        self._dirs = {}
+        if poll_interval is None:
+            try:
+                self._inotify = _Inotify()
+            except OSError as e:
+                print(f"Warning: {e}; falling back to polling")
+                self.poll_interval = 1.0
+        self.backend = 'inotify' if self._inotify else 'polling'
+
+    def start(self):
+        if self._inotify:
+            # Watch before the initial scan so nothing arriving in between is missed
+            self._watch_tree(self.directory)
+            target = self._run_inotify
+        else:
+            target = self._run_polling
+        self._thread = threading.Thread(target=target, name='rune-watcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+        if self._inotify:
+            self._inotify.close()
+
+    def _wanted(self, path):
+        return path.suffix.lower() in self.extensions and not path.name.startswith('.')
+
+    def _iter_files(self, directory):
+        pattern = '**/*' if self.recursive else '*'
+        for path in sorted(directory.glob(pattern)):
+            if self._wanted(path) and path.is_file():
+                yield path
+
+    def _watch_tree(self, directory):
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_ONLYDIR
+        directories = [directory]
+        if self.recursive:
+            directories += [p for p in sorted(directory.rglob('*')) if p.is_dir()]
+        for path in directories:
+            try:
+                self._dirs[self._inotify.add_watch(path, mask)] = path
+            except OSError as e:
+                print(f"Warning: Could not watch {path}: {e}")
+
+    def _run_inotify(self):
+        for path in self._iter_files(self.directory):
+            self.paths.put(path)
+
+        while not self._stop.is_set():
+            try:
+                events = self._inotify.read(timeout=0.5)
+            except OSError:
+                if self._stop.is_set():
+                    return
+                raise
+            for wd, mask, name in events:
+                if mask & IN_Q_OVERFLOW:
+                    # The kernel queue overflowed and events were lost: rescan everything
+                    for path in self._iter_files(self.directory):
+                        self.paths.put(path)
+                    continue
+                if mask & IN_IGNORED:
+                    self._dirs.pop(wd, None)
+                    continue
+                parent = self._dirs.get(wd)
+                if parent is None or not name:
+                    continue
+                path = parent / name
+                if mask & IN_ISDIR:
+                    if self.recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                        # Files can land before the new folder's watch is in place
+                        self._watch_tree(path)
+                        for file_path in self._iter_files(path):
+                            self.paths.put(file_path)
+                elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO) and self._wanted(path):
+                    self.paths.put(path)
+
+    def _run_polling(self):
+        previous = {}
+        reported = {}
+        while not self._stop.is_set():
+            current = {}
+            for path in self._iter_files(self.directory):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                signature = (stat.st_size, stat.st_mtime_ns)
+                current[path] = signature
+                if previous.get(path) == signature and reported.get(path) != signature:
+                    reported[path] = signature
+                    self.paths.put(path)
+            reported = {path: sig for path, sig in reported.items() if path in current}
+            previous = current
+            self._stop.wait(self.poll_interval)
+
+
+class Checkpoint:
+    """
+    Append-only journal of processed files
+
+    A file counts as done while its path, size and mtime match a journal
+    entry, so a replaced file is processed again. The journal is compacted
+    on load, dropping entries for files that no longer exist.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._done = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Torn last line from a crash mid-write
+                        continue
+                    self._done[entry['path']] = (entry['size'], entry['mtime_ns'])
+            self._compact()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    @staticmethod
+    def signature(path):
+        """(size, mtime_ns) of a file, or None if it is gone"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def __len__(self):
+        return len(self._done)
+
+    def is_done(self, path, signature):
+        return self._done.get(str(path)) == signature
+
+    def add(self, entries):
+        """Record (path, signature) pairs durably"""
+        lines = []
+        for path, (size, mtime_ns) in entries:
+            self._done[str(path)] = (size, mtime_ns)
+            lines.append(json.dumps({'path': str(path), 'size': size, 'mtime_ns': mtime_ns}, ensure_ascii=False) + '\n')
+        _append_durably(self._file, ''.join(lines))
+
+    def _compact(self):
+        self._done = {path: sig for path, sig in self._done.items() if self.signature(path) == sig}
+        tmp_path = self.path.with_name(f'.{self.path.name}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for path, (size, mtime_ns) in self._done.items():
+                f.write(json.dumps({'path': path, 'size': size, 'mtime_ns': mtime_ns}, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        self._file.close()
+
+
+class HotFolder:
+    """
+    Watch a folder and run one long-lived RuneDetector on new screenshots
+
+    New files go into a work queue. The main loop takes the oldest file,
+    keeps collecting until ``batch_size`` files are waiting or
+    ``max_wait_ms`` has passed, and runs one batched detection. Results are
+    written atomically (sidecar JSON via rename, results log lines appended
+    and fsynced per batch) before the batch is added to the checkpoint, so
+    a crash can repeat a batch but never lose one.
+    """
+
+    def __init__(self, detector, directory, extensions, results_path=None, sidecars=False, checkpoint_path=None,
+                 batch_size=16, max_wait_ms=500.0, workers=4, recursive=True, poll_interval=None):
+        """
+        Args:
+            detector: Loaded RuneDetector instance
+            directory: Folder to watch
+            extensions: Image file suffixes to pick up
+            results_path: JSON Lines results log, appended to across restarts (optional)
+            sidecars: Write ``<image>.json`` with the detections next to each image
+            checkpoint_path: Processed-files journal (default: .rune_checkpoint.jsonl in the folder)
+            batch_size: Maximum images per model call
+            max_wait_ms: Batching deadline, measured from the oldest waiting file
+            workers: Image decoding threads
+            recursive: Also watch subfolders
+            poll_interval: Poll every N seconds instead of using inotify
+        """
+        self.detector = detector
+        self.directory = Path(directory).resolve()
+        self.results_path = results_path
+        self.sidecars = sidecars
+        self.batch_size = batch_size
+        self.max_wait_ms = max_wait_ms
+        self.workers = workers
+        self.watcher = FolderWatcher(directory, extensions, recursive=recursive, poll_interval=poll_interval)
+        self.checkpoint = Checkpoint(checkpoint_path or self.directory / '.rune_checkpoint.jsonl')
+
+        self.results_file = None
+        if results_path:
+            Path(results_path).parent.mkdir(parents=True, exist_ok=True)
+            _repair_torn_line(results_path)
+            self.results_file = open(results_path, 'a', encoding='utf-8')
+
+        self.images = 0
+        self.errors = 0
+        self.batches = 0
+        self.skipped = 0
+
+    def run(self):
+        """Process files until interrupted with Ctrl+C"""
+        self.watcher.start()
+        print(f"\nWatching {self.directory} for new images ({self.watcher.backend}, "
+              f"batches of up to {self.batch_size}, {len(self.checkpoint)} file(s) already processed)")
+        print("Press Ctrl+C to stop")
+
+        start_time = time.time()
+        try:
+            while True:
+                batch = self._collect()
+                if batch:
+                    self._process(batch)
+        except KeyboardInterrupt:
+            print("\nStopped by user")
+        finally:
+            self.watcher.stop()
+            self.checkpoint.close()
+            if self.results_file:
+                self.results_file.close()
+
+        elapsed = time.time() - start_time
+        print(f"\nProcessed {self.images} image(s) in {self.batches} batch(es) "
+              f"({self.errors} unreadable, {self.skipped} already done) over {elapsed:.0f}s")
+        if self.results_path:
+            print(f"Results log: {self.results_path}")
+
+    def _next_pending(self, timeout):
+        """Next queued file that is not done yet, as (path, signature), or None on timeout"""
+        deadline = time.perf_counter() + timeout
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return None
+            try:
+                path = self.watcher.paths.get(timeout=remaining)
+            except queue.Empty:
+                return None
+            signature = Checkpoint.signature(path)
+            if signature is None:
+                continue
+            if self.checkpoint.is_done(path, signature):
+                self.skipped += 1
+                continue
+            return path, signature
+
+    def _collect(self):
+        first = self._next_pending(timeout=0.5)
+        if first is None:
+            return []
+        batch = {first[0]: first[1]}
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            item = self._next_pending(timeout=remaining)
+            if item is None:
+                break
+            # The same file can be reported twice (initial scan and event)
+            batch[item[0]] = item[1]
+        return list(batch.items())
+
+    def _process(self, batch):
+        paths = [str(path) for path, _ in batch]
+        found = {}
+        for _, _, detections in self.detector.stream(paths, batch_size=len(paths), workers=self.workers):
+            found[detections.source] = detections
+
+        records = []
+        num_detections = 0
+        for path in paths:
+            detections = found.get(path)
+            if detections is None:
+                records.append({'image': path, 'error': 'unreadable'})
+                self.errors += 1
+            else:
+                records.append({'image': path, 'detections': detections.to_list()})
+                num_detections += len(detections)
+
+        if self.sidecars:
+            for record in records:
+                _write_atomic(f"{record['image']}.json", json.dumps(record, ensure_ascii=False, indent=2))
+        if self.results_file:
+            _append_durably(self.results_file,
+                            ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records))
+        self.checkpoint.add(batch)
+
+        self.images += len(batch)
+        self.batches += 1
+        print(f"Batch {self.batches}: {len(batch)} image(s), {num_detections} rune(s), "
+              f"{self.watcher.paths.qsize()} queued")
+
+
+def _write_atomic(path, text):
+    """Write a file so readers see either the old or the complete new content"""
+    path = Path(path)
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _append_durably(f, text):
+    """Append whole lines with one write and make them durable before returning"""
+    f.write(text)
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def _repair_torn_line(path):
+    """Cut off an incomplete last line left by a crash mid-append"""
+    try:
+        f = open(path, 'rb+')
+    except FileNotFoundError:
+        return
+    with f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(position - 64 * 1024, 0)
+            f.seek(start)
+            chunk = f.read(position - start)
+            if position == end and chunk.endswith(b'\n'):
+                return
+            newline = chunk.rfind(b'\n')
+            if newline >= 0:
+                f.truncate(start + newline + 1)
+                return
+            position = start
+        f.truncate(0)
@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# The modules under test are top-level scripts in the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Windows-only Kiwoom Open API scripts, run by hand
+collect_ignore = ['manual']
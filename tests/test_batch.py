@@ -0,0 +1,37 @@
+"""Directory/glob expansion and ordered image decoding for batched inference"""
+
+import cv2
+import numpy as np
+
+from detect_rune import _decode_images, collect_image_paths
+
+
+def _write_image(path, value):
+    cv2.imwrite(str(path), np.full((8, 8, 3), value, dtype=np.uint8))
+
+
+def test_collect_image_paths_filters_and_sorts(tmp_path):
+    for name in ('b.png', 'a.JPG', 'c.txt'):
+        (tmp_path / name).write_bytes(b'')
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / 'd.png').write_bytes(b'')
+
+    assert collect_image_paths(str(tmp_path)) == [str(tmp_path / 'a.JPG'), str(tmp_path / 'b.png')]
+    assert collect_image_paths(str(tmp_path / '**' / '*.png')) == [str(tmp_path / 'b.png'),
+                                                                   str(tmp_path / 'sub' / 'd.png')]
+
+
+def test_decode_images_keeps_input_order(tmp_path):
+    paths = []
+    for i in range(20):
+        path = tmp_path / f'{i:02d}.png'
+        _write_image(path, i)
+        paths.append(str(path))
+    paths.insert(5, str(tmp_path / 'missing.png'))
+
+    decoded = list(_decode_images(paths, workers=4, prefetch=3))
+
+    assert [path for path, _ in decoded] == paths
+    assert decoded[5][1] is None
+    values = [int(frame[0, 0, 0]) for path, frame in decoded if frame is not None]
+    assert values == list(range(20))
@@ -0,0 +1,75 @@
+"""On-disk result cache: content keys, LRU eviction and rebuild from file mtimes"""
+
+import os
+
+import numpy as np
+
+from rune_cache import ResultCache
+
+SETTINGS = {'weights': 'abc', 'conf': 0.25, 'iou': 0.45, 'imgsz': 640}
+
+
+def _put(cache, key, value=0.5):
+    cache.put(key, np.zeros((1, 4), dtype=np.float32), np.array([value], dtype=np.float32),
+              np.array([0], dtype=np.int32), (480, 640))
+
+
+def _entry_size(tmp_path):
+    cache = ResultCache(tmp_path / 'probe', SETTINGS)
+    _put(cache, 'aa00')
+    return (tmp_path / 'probe' / 'aa' / 'aa00.npz').stat().st_size
+
+
+def test_keys_depend_on_content_and_settings(tmp_path):
+    cache = ResultCache(tmp_path, SETTINGS)
+    other = ResultCache(tmp_path, {**SETTINGS, 'conf': 0.5})
+
+    assert cache.key_for_bytes(b'image') == cache.key_for_bytes(b'image')
+    assert cache.key_for_bytes(b'image') != cache.key_for_bytes(b'other')
+    assert cache.key_for_bytes(b'image') != other.key_for_bytes(b'image')
+    assert cache.key_for_file(tmp_path / 'missing.png') is None
+
+
+def test_hit_returns_stored_arrays(tmp_path):
+    cache = ResultCache(tmp_path, SETTINGS)
+    assert cache.get('ab01') is None
+    _put(cache, 'ab01', 0.75)
+
+    entry = cache.get('ab01')
+
+    assert entry['conf'].tolist() == [0.75]
+    assert entry['orig_shape'].tolist() == [480, 640]
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_evicts_least_recently_used(tmp_path):
+    size = _entry_size(tmp_path)
+    cache = ResultCache(tmp_path / 'cache', SETTINGS, max_bytes=int(size * 2.5))
+    _put(cache, 'aa01')
+    _put(cache, 'bb02')
+    assert cache.get('aa01') is not None  # aa01 is now the most recently used
+
+    _put(cache, 'cc03')
+
+    assert cache.stats()['evictions'] == 1
+    assert cache.get('bb02') is None
+    assert cache.get('aa01') is not None
+    assert not (tmp_path / 'cache' / 'bb' / 'bb02.npz').exists()
+
+
+def test_rebuild_orders_entries_by_mtime(tmp_path):
+    size = _entry_size(tmp_path)
+    cache = ResultCache(tmp_path / 'cache', SETTINGS)
+    for key in ('aa01', 'bb02', 'cc03'):
+        _put(cache, key)
+    # The first entry was used most recently in an earlier run
+    for i, key in enumerate(('bb02', 'cc03', 'aa01')):
+        path = tmp_path / 'cache' / key[:2] / f'{key}.npz'
+        os.utime(path, ns=(1_000_000_000 * (i + 1), 1_000_000_000 * (i + 1)))
+
+    reopened = ResultCache(tmp_path / 'cache', SETTINGS, max_bytes=int(size * 3.5))
+    assert reopened.stats()['entries'] == 3
+    _put(reopened, 'dd04')
+
+    assert reopened.get('bb02') is None
+    assert reopened.get('aa01') is not None
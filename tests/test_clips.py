@@ -0,0 +1,50 @@
+"""Event-clip recording: pre-roll ring, post-roll merging and the detections sidecar"""
+
+import json
+
+import numpy as np
+
+from detect_rune import ClipRecorder, Detections
+
+NAMES = {0: 'rune'}
+
+
+def _detections(found):
+    if not found:
+        return Detections(np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32),
+                          np.zeros(0, dtype=np.int32), NAMES)
+    return Detections(np.array([[1, 2, 3, 4]], dtype=np.float32), np.array([0.9], dtype=np.float32),
+                      np.array([0], dtype=np.int32), NAMES)
+
+
+def test_clips_include_pre_roll_and_merge_within_post_roll(tmp_path):
+    # 10 fps: 3 frames of pre-roll and 3 of post-roll
+    recorder = ClipRecorder(tmp_path, 'video', 10, (32, 24), NAMES, pre_roll=0.3, post_roll=0.3)
+    detected = {5, 8, 15}
+    for i in range(20):
+        frame = np.full((24, 32, 3), i, dtype=np.uint8)
+        recorder.add(i, i / 10, frame, _detections(i in detected))
+    recorder.close()
+
+    spans = [(clip['start_frame'], clip['end_frame']) for clip in recorder.clips]
+    # 8 is within the post-roll of 5, so both share the first clip
+    assert spans == [(2, 11), (12, 18)]
+    assert recorder.frames_written == 10 + 7
+    assert all((tmp_path / f'video_clip{i:03d}.mp4').exists() for i in (1, 2))
+
+    lines = (tmp_path / 'video.detections.jsonl').read_text().splitlines()
+    header, records = json.loads(lines[0]), [json.loads(line) for line in lines[1:]]
+    assert header['names'] == {'0': 'rune'} and header['size'] == [32, 24]
+    assert [(r['frame'], r['clip']) for r in records] == [
+        (5, 'video_clip001.mp4'), (8, 'video_clip001.mp4'), (15, 'video_clip002.mp4')]
+    assert records[0]['boxes'] == [[1.0, 2.0, 3.0, 4.0, 0.9, 0]]
+
+
+def test_no_detections_writes_no_clip(tmp_path):
+    recorder = ClipRecorder(tmp_path, 'quiet', 10, (32, 24), NAMES)
+    for i in range(50):
+        recorder.add(i, i / 10, np.zeros((24, 32, 3), dtype=np.uint8), _detections(False))
+    recorder.close()
+
+    assert recorder.clips == [] and recorder.frames_written == 0
+    assert len(recorder.ring) == 20
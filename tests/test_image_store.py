@@ -0,0 +1,87 @@
+"""Preprocessed training image store: resizing, reuse and invalidation"""
+
+import os
+import types
+
+import cv2
+import numpy as np
+
+from rune_dataset import ImageStore, resize_long_side
+
+
+def _write_image(path, width, height, value):
+    image = np.random.default_rng(value).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    cv2.imwrite(str(path), image)
+    return cv2.imread(str(path))
+
+
+def test_slots_match_load_image_resizing(tmp_path):
+    original = _write_image(tmp_path / 'a.png', 200, 100, 1)
+    store = ImageStore(tmp_path / 'store', 'train', 64)
+    assert store.prepare([tmp_path / 'a.png']) == 1
+
+    image, hw0 = store.read(store.slots[os.path.abspath(tmp_path / 'a.png')])
+
+    assert hw0 == (100, 200) and image.shape == (32, 64, 3)
+    np.testing.assert_array_equal(image, cv2.resize(original, (64, 32), interpolation=cv2.INTER_LINEAR))
+
+
+def test_validation_store_downscales_with_area_interpolation(tmp_path):
+    original = _write_image(tmp_path / 'a.png', 200, 100, 1)
+    store = ImageStore(tmp_path / 'store', 'val', 64, augment=False)
+    store.prepare([tmp_path / 'a.png'])
+
+    image, _ = store.read(store.slots[os.path.abspath(tmp_path / 'a.png')])
+
+    np.testing.assert_array_equal(image, resize_long_side(original, 64, augment=False))
+    np.testing.assert_array_equal(image, cv2.resize(original, (64, 32), interpolation=cv2.INTER_AREA))
+    assert store.array_path != ImageStore(tmp_path / 'store', 'val', 64).array_path
+
+
+def test_unchanged_touched_and_changed_files(tmp_path):
+    files = [tmp_path / f'{i}.png' for i in range(3)]
+    for i, path in enumerate(files):
+        _write_image(path, 80, 60, i)
+    assert ImageStore(tmp_path / 'store', 'train', 64).prepare(files) == 3
+
+    # Unchanged: nothing is decoded
+    assert ImageStore(tmp_path / 'store', 'train', 64).prepare(files) == 0
+
+    # Touched without a content change: re-hashed but not re-decoded
+    os.utime(files[0], ns=(1, 1))
+    assert ImageStore(tmp_path / 'store', 'train', 64).prepare(files) == 0
+
+    # New content: only that file is decoded again
+    changed = _write_image(files[1], 80, 60, 99)
+    store = ImageStore(tmp_path / 'store', 'train', 64)
+    assert store.prepare(files) == 1
+    image, _ = store.read(store.slots[os.path.abspath(files[1])])
+    np.testing.assert_array_equal(image, resize_long_side(changed, 64))
+
+
+def test_new_file_or_imgsz_rebuilds(tmp_path):
+    files = [tmp_path / f'{i}.png' for i in range(2)]
+    for i, path in enumerate(files):
+        _write_image(path, 80, 60, i)
+    ImageStore(tmp_path / 'store', 'train', 64).prepare(files[:1])
+
+    assert ImageStore(tmp_path / 'store', 'train', 64).prepare(files) == 2
+    assert ImageStore(tmp_path / 'store', 'train', 32).prepare(files) == 2
+
+
+def test_unreadable_images_are_left_to_the_loader(tmp_path):
+    good, bad = tmp_path / 'good.png', tmp_path / 'bad.png'
+    _write_image(good, 80, 60, 0)
+    bad.write_bytes(b'not an image')
+    store = ImageStore(tmp_path / 'store', 'train', 64)
+    store.prepare([good, bad])
+
+    assert os.path.abspath(good) in store.slots and os.path.abspath(bad) not in store.slots
+
+
+def test_attach_skips_unsupported_datasets(tmp_path):
+    _write_image(tmp_path / 'a.png', 80, 60, 0)
+    store = ImageStore(tmp_path / 'store', 'train', 64)
+    store.prepare([tmp_path / 'a.png'])
+
+    assert store.attach(types.SimpleNamespace(im_files=[str(tmp_path / 'a.png')])) is None
@@ -0,0 +1,65 @@
+"""Server micro-batching: batch formation, result routing and failure handling"""
+
+import threading
+import time
+
+import pytest
+
+from rune_server import Histogram, MicroBatcher
+
+
+def test_histogram_buckets():
+    histogram = Histogram([1, 2, 4])
+    for value in (1, 2, 3, 4, 9):
+        histogram.add(value)
+
+    assert histogram.to_dict() == {'<=1': 1, '<=2': 1, '<=4': 2, '+Inf': 1}
+
+
+def test_concurrent_frames_share_a_batch_and_get_their_own_result():
+    calls = []
+
+    def detect(frames):
+        calls.append(list(frames))
+        return [frame * 10 for frame in frames]
+
+    batcher = MicroBatcher(detect, max_batch_size=4, max_wait_ms=200)
+    futures = [batcher.submit(i) for i in range(6)]
+    batcher.start()
+    try:
+        results = [future.result(timeout=5) for future in futures]
+    finally:
+        batcher.stop()
+
+    assert results == [0, 10, 20, 30, 40, 50]
+    assert calls == [[0, 1, 2, 3], [4, 5]]
+    stats = batcher.stats()
+    assert stats['batches'] == 2 and stats['frames'] == 6
+    assert stats['batch_size_histogram']['<=4'] == 1 and stats['batch_size_histogram']['<=2'] == 1
+
+
+def test_batch_closes_after_max_wait():
+    batcher = MicroBatcher(lambda frames: frames, max_batch_size=8, max_wait_ms=20).start()
+    try:
+        start = time.perf_counter()
+        assert batcher.submit('frame').result(timeout=5) == 'frame'
+        assert time.perf_counter() - start < 2
+    finally:
+        batcher.stop()
+
+
+@pytest.mark.parametrize('detect', [
+    lambda frames: 1 / 0,
+    lambda frames: frames[:-1],
+])
+def test_failed_batch_fails_every_caller(detect):
+    batcher = MicroBatcher(detect, max_batch_size=4, max_wait_ms=50)
+    futures = [batcher.submit(i) for i in range(3)]
+    batcher.start()
+    try:
+        for future in futures:
+            with pytest.raises(Exception):
+                future.result(timeout=5)
+    finally:
+        batcher.stop()
+    assert not any(thread.name == 'rune-batcher' for thread in threading.enumerate())
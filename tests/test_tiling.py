@@ -0,0 +1,47 @@
+"""Tile placement and duplicate merging for tiled inference"""
+
+import numpy as np
+
+from detect_rune import nms, tile_origins, weighted_boxes_fusion
+
+
+def test_tile_origins_cover_frame_edges():
+    origins = tile_origins((1080, 1920), 640, 0.2)
+
+    xs = sorted({x for x, _ in origins})
+    ys = sorted({y for _, y in origins})
+    assert xs == [0, 512, 1024, 1280]
+    assert ys == [0, 440]
+    assert len(origins) == len(xs) * len(ys)
+
+
+def test_tile_origins_small_frame_is_one_tile():
+    assert tile_origins((480, 640), 640, 0.2) == [(0, 0)]
+
+
+def test_nms_is_class_aware():
+    detections = np.array([
+        [0, 0, 10, 10, 0.6, 0],
+        [1, 1, 11, 11, 0.9, 0],
+        [1, 1, 11, 11, 0.8, 1],
+        [50, 50, 60, 60, 0.7, 0],
+    ], dtype=np.float32)
+
+    keep = nms(detections, 0.5)
+
+    # Highest confidence first; the overlapping class-0 box is dropped, the class-1 one is not
+    assert keep.tolist() == [1, 2, 3]
+
+
+def test_weighted_boxes_fusion_averages_by_confidence():
+    detections = np.array([
+        [0, 0, 10, 10, 0.75, 0],
+        [2, 0, 12, 10, 0.25, 0],
+        [100, 100, 110, 110, 0.5, 0],
+    ], dtype=np.float32)
+
+    fused = weighted_boxes_fusion(detections, 0.5)
+
+    assert fused.shape == (2, 6)
+    np.testing.assert_allclose(fused[0], [0.5, 0, 10.5, 10, 0.75, 0])
+    np.testing.assert_allclose(fused[1], detections[2])
@@ -0,0 +1,59 @@
+"""Hot-folder checkpoint journal: replay, change detection and crash repair"""
+
+import json
+
+from rune_watch import Checkpoint, _repair_torn_line
+
+
+def _entry(path):
+    return path, Checkpoint.signature(path)
+
+
+def test_replay_marks_unchanged_files_done(tmp_path):
+    image = tmp_path / 'a.png'
+    image.write_bytes(b'one')
+    journal = tmp_path / 'checkpoint.jsonl'
+
+    checkpoint = Checkpoint(journal)
+    checkpoint.add([_entry(image)])
+    checkpoint.close()
+
+    replayed = Checkpoint(journal)
+    assert replayed.is_done(image, Checkpoint.signature(image))
+    replayed.close()
+
+    # A replaced file (different size/mtime) is processed again
+    image.write_bytes(b'changed')
+    assert not Checkpoint(journal).is_done(image, Checkpoint.signature(image))
+
+
+def test_compaction_drops_deleted_files_and_torn_lines(tmp_path):
+    kept, deleted = tmp_path / 'kept.png', tmp_path / 'deleted.png'
+    kept.write_bytes(b'k')
+    deleted.write_bytes(b'd')
+    journal = tmp_path / 'checkpoint.jsonl'
+
+    checkpoint = Checkpoint(journal)
+    checkpoint.add([_entry(kept), _entry(deleted)])
+    checkpoint.close()
+    deleted.unlink()
+    with open(journal, 'a', encoding='utf-8') as f:
+        f.write('{"path": "half')
+
+    replayed = Checkpoint(journal)
+    replayed.close()
+
+    assert len(replayed) == 1
+    lines = journal.read_text(encoding='utf-8').splitlines()
+    assert [json.loads(line)['path'] for line in lines] == [str(kept)]
+
+
+def test_repair_torn_line(tmp_path):
+    log = tmp_path / 'results.jsonl'
+    log.write_bytes(b'{"a": 1}\n{"b": 2}\n{"c"')
+    _repair_torn_line(log)
+    assert log.read_bytes() == b'{"a": 1}\n{"b": 2}\n'
+
+    _repair_torn_line(log)
+    assert log.read_bytes() == b'{"a": 1}\n{"b": 2}\n'
+    _repair_torn_line(tmp_path / 'missing.jsonl')
@@ -5,24 +5,45 @@ Train YOLO12 model for rune detection
 """
 
 import argparse
+import os
+import time
 import yaml
 from pathlib import Path
-from ultralytics import YOLO
-import torch
+
+# ultralytics (and with it torch) is imported inside the commands that need it,
+# so --help and argument errors return immediately
+
+# Image store directory used by --prepare-data / --image-store when the config sets none
+DEFAULT_IMAGE_STORE = 'data/.image_store'
 
 
 class RuneTrainer:
     """Train YOLO12 model for rune detection"""
 
-    def __init__(self, config_path='config.yaml'):
+    def __init__(self, config_path='config.yaml', use_profile=True, image_store=None):
         """
         Initialize trainer with configuration
 
         Args:
             config_path: Path to configuration file
+            use_profile: Apply the data-loader workers and torch threads from the
+                machine profile saved by rune_tuning.py (CPU training only)
+            image_store: Read training images from the preprocessed store in this
+                directory instead of decoding them every epoch; True for
+                ``dataset.image_store`` or DEFAULT_IMAGE_STORE (default:
+                ``dataset.image_store``, which is off unless set)
         """
         self.config_path = config_path
         self.config = self.load_config()
+        configured = self.config['dataset'].get('image_store')
+        if image_store is True:
+            image_store = configured or DEFAULT_IMAGE_STORE
+        self.image_store = image_store or configured
+        self.thread_profile = None
+        if use_profile:
+            from rune_tuning import load_profile
+
+            self.thread_profile = load_profile('training')
         print("Trainer initialized")
         print(f"Configuration loaded from: {config_path}")
 
@@ -43,6 +64,8 @@ class RuneTrainer:
             batch_size: Batch size (overrides config)
             img_size: Image size (overrides config)
         """
+        from ultralytics import YOLO
+
         # Get training parameters from config or arguments
         data_yaml = data_yaml or self.config['dataset']['data_yaml']
         model_name = model_name or self.config['model']['architecture']
@@ -81,6 +104,14 @@ class RuneTrainer:
             print(f"Using default pretrained weights for {model_name}")
             model = YOLO(f'{model_name}.pt')
 
+        workers = self.config['training']['workers']
+        profiled = self.thread_profile and str(self.config['training']['device']) == 'cpu'
+        if profiled:
+            from rune_tuning import describe
+
+            workers = self.thread_profile['workers']
+            print(f"Thread settings from machine profile: {describe(self.thread_profile)}")
+
         # Training arguments
         train_args = {
             'data': data_yaml,
@@ -88,7 +119,7 @@ class RuneTrainer:
             'batch': batch_size,
             'imgsz': img_size,
             'device': self.config['training']['device'],
-            'workers': self.config['training']['workers'],
+            'workers': workers,
             'optimizer': self.config['training']['optimizer'],
             'lr0': self.config['training']['learning_rate'],
             'amp': self.config['training']['amp'],
@@ -99,6 +130,8 @@ class RuneTrainer:
             'exist_ok': True,
             'verbose': True
         }
+        if profiled or self.image_store:
+            train_args['trainer'] = _rune_trainer(self.thread_profile if profiled else None, self.image_store)
 
         print("\nStarting training...")
         print("This may take a while depending on your hardware and dataset size.\n")
@@ -145,6 +178,8 @@ class RuneTrainer:
         print(f"\nValidating model: {model_path}")
         print(f"Dataset: {data_yaml}")
 
+        from ultralytics import YOLO
+
         model = YOLO(model_path)
 
         try:
@@ -163,6 +198,177 @@ class RuneTrainer:
             print(f"Error during validation: {e}")
             return None
 
+    def quantize(self, model_path=None, data_yaml=None, fraction=None, img_size=None, latency_samples=None):
+        """
+        Quantize a trained model to INT8 and compare it with the FP32 model
+
+        Calibration uses a fraction of the dataset's training images. The
+        result is an OpenVINO INT8 model directory next to the weights
+        (e.g. ``best_int8_openvino_model``), loadable with
+        ``detect_rune.py --model``.
+
+        Args:
+            model_path: Path to trained FP32 .pt model
+            data_yaml: Path to dataset YAML file (calibration and validation)
+            fraction: Fraction of the training set used for calibration
+            img_size: Image size
+            latency_samples: Number of validation images timed for latency
+
+        Returns:
+            Path to the INT8 model, or None on failure
+        """
+        import numpy as np
+        from ultralytics import YOLO
+
+        quant_config = self.config.get('quantization', {})
+        model_path = model_path or self.config['model']['custom_model']
+        data_yaml = data_yaml or self.config['dataset']['data_yaml']
+        fraction = fraction or quant_config.get('fraction', 0.1)
+        img_size = img_size or self.config['training']['img_size']
+        latency_samples = latency_samples or quant_config.get('latency_samples', 50)
+
+        if not Path(model_path).exists():
+            print(f"Error: Model not found: {model_path}")
+            return None
+        if not Path(data_yaml).exists():
+            print(f"Error: Dataset YAML file not found: {data_yaml}")
+            return None
+
+        print(f"\nQuantizing model: {model_path}")
+        print(f"Calibration data: {data_yaml} (fraction: {fraction})")
+
+        try:
+            int8_path = YOLO(model_path).export(
+                format='openvino',
+                int8=True,
+                data=data_yaml,
+                fraction=fraction,
+                imgsz=img_size
+            )
+        except Exception as e:
+            print(f"Error during quantization: {e}")
+            print("\nINT8 export requires the openvino and nncf packages:")
+            print("  pip install openvino nncf")
+            return None
+
+        print(f"INT8 model saved to: {int8_path}")
+
+        device = self.config['training']['device']
+        images = self._sample_images(data_yaml, latency_samples)
+        report = {}
+        for label, path, kwargs in (('FP32', model_path, {}), ('INT8', int8_path, {'task': 'detect'})):
+            model = YOLO(path, **kwargs)
+            metrics = model.val(data=data_yaml, imgsz=img_size, device=device, verbose=False)
+            latencies = self._measure_latency(model, images, img_size, device)
+            report[label] = (metrics.box.map50, metrics.box.map, latencies)
+
+        print("\n" + "="*60)
+        print("Quantization Report")
+        print("="*60)
+        print(f"{'':<6}{'mAP50':>10}{'mAP50-95':>10}{'median ms':>12}{'p95 ms':>10}")
+        for label, (map50, map50_95, latencies) in report.items():
+            median = np.percentile(latencies, 50) if latencies else float('nan')
+            p95 = np.percentile(latencies, 95) if latencies else float('nan')
+            print(f"{label:<6}{map50:>10.4f}{map50_95:>10.4f}{median:>12.1f}{p95:>10.1f}")
+        print(f"\nLatency measured on {len(images)} validation image(s), batch size 1")
+        print("="*60)
+        print("\nTo use the INT8 model for detection:")
+        print(f"  python detect_rune.py --source <image/video> --model {int8_path}")
+
+        return int8_path
+
+    def prepare_data(self, data_yaml=None, img_size=None):
+        """
+        Decode and resize the dataset's train/val images into the image store
+
+        Training with the store enabled does this on its own when the store
+        is missing or stale; running it up front keeps the first epoch from
+        paying for it.
+
+        Args:
+            data_yaml: Path to dataset YAML file (overrides config)
+            img_size: Image size (overrides config)
+
+        Returns:
+            Number of images decoded, or None on failure
+        """
+        from ultralytics.data.utils import check_det_dataset
+        from rune_dataset import ImageStore, dataset_image_files, store_name
+
+        data_yaml = data_yaml or self.config['dataset']['data_yaml']
+        img_size = img_size or self.config['training']['img_size']
+
+        store_dir = self.image_store or DEFAULT_IMAGE_STORE
+        if not Path(data_yaml).exists():
+            print(f"Error: Dataset YAML file not found: {data_yaml}")
+            return None
+
+        data = check_det_dataset(data_yaml)
+        decoded = 0
+        for split in ('train', 'val'):
+            img_path = data.get(split)
+            if not img_path:
+                continue
+            # Validation is not augmented, which changes the resize interpolation
+            store = ImageStore(store_dir, store_name(img_path), img_size, augment=split == 'train')
+            decoded += store.prepare(dataset_image_files(img_path))
+            print(f"{split}: {len(store.slots)} image(s) in {store.array_path}")
+        if not self.image_store:
+            print(f"Train with --image-store {store_dir} (or set dataset.image_store) to read from the store")
+        return decoded
+
+    def _sample_images(self, data_yaml, limit):
+        """Return up to ``limit`` validation image paths from a dataset YAML"""
+        from ultralytics.data.utils import check_det_dataset
+        from rune_dataset import dataset_image_files
+
+        data = check_det_dataset(data_yaml)
+        return dataset_image_files(data.get('val') or data.get('train'))[:limit]
+
+    def _measure_latency(self, model, images, img_size, device, warmup=3):
+        """Time single-image predictions, returning per-image latency in ms"""
+        for image in images[:warmup]:
+            model.predict(source=image, imgsz=img_size, device=device, verbose=False)
+
+        latencies = []
+        for image in images:
+            start = time.perf_counter()
+            model.predict(source=image, imgsz=img_size, device=device, verbose=False)
+            latencies.append((time.perf_counter() - start) * 1000)
+        return latencies
+
+
+def _rune_trainer(thread_profile=None, image_store=None):
+    """
+    DetectionTrainer class for machine profile thread settings and/or the image store
+
+    Args:
+        thread_profile: Training section of the rune_tuning.py machine profile
+        image_store: Directory of the preprocessed image store
+    """
+    from ultralytics.models.yolo.detect import DetectionTrainer
+
+    class RuneDetectionTrainer(DetectionTrainer):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            if thread_profile:
+                from rune_tuning import apply_threads
+
+                # BaseTrainer forces workers=0 and resets torch threads when training on CPU
+                self.args.workers = thread_profile['workers']
+                apply_threads(thread_profile)
+
+        def build_dataset(self, img_path, mode='train', batch=None):
+            dataset = super().build_dataset(img_path, mode=mode, batch=batch)
+            if image_store:
+                from rune_dataset import attach_image_store
+
+                attach_image_store(dataset, image_store, img_path, self.args.imgsz,
+                                   workers=max(self.args.workers, os.cpu_count() or 1))
+            return dataset
+
+    return RuneDetectionTrainer
+
 
 def main():
     parser = argparse.ArgumentParser(description='Train YOLO12 model for rune detection')
@@ -173,16 +379,38 @@ def main():
     parser.add_argument('--batch', type=int, help='Batch size')
     parser.add_argument('--img-size', type=int, help='Image size')
     parser.add_argument('--validate', action='store_true', help='Run validation only')
-    parser.add_argument('--model-path', type=str, help='Path to model for validation')
+    parser.add_argument('--model-path', type=str, help='Path to model for validation/quantization')
+    parser.add_argument('--quantize', action='store_true',
+                        help='Quantize the model to INT8 and compare accuracy/latency with FP32')
+    parser.add_argument('--fraction', type=float, help='Fraction of training images used for INT8 calibration')
+    parser.add_argument('--no-profile', action='store_true',
+                        help='Ignore the machine thread profile saved by rune_tuning.py')
+    parser.add_argument('--prepare-data', action='store_true',
+                        help='Decode and resize the dataset into the image store and exit')
+    parser.add_argument('--image-store', type=str, nargs='?', const=True, metavar='DIR',
+                        help='Read training images from the preprocessed image store in DIR '
+                             f'(default: dataset.image_store, else {DEFAULT_IMAGE_STORE})')
 
     args = parser.parse_args()
 
     # Initialize trainer
-    trainer = RuneTrainer(config_path=args.config)
+    trainer = RuneTrainer(config_path=args.config, use_profile=not args.no_profile,
+                          image_store=args.image_store)
 
-    if args.validate:
+    if args.prepare_data:
+        # Build or refresh the preprocessed image store
+        trainer.prepare_data(data_yaml=args.data, img_size=args.img_size)
+    elif args.validate:
         # Run validation
         trainer.validate(model_path=args.model_path, data_yaml=args.data)
+    elif args.quantize:
+        # Run INT8 quantization
+        trainer.quantize(
+            model_path=args.model_path,
+            data_yaml=args.data,
+            fraction=args.fraction,
+            img_size=args.img_size
+        )
     else:
         # Run training
         trainer.train(